@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
 import numpy as np
 from loguru import logger
 import cv2
@@ -12,20 +15,47 @@ except ImportError:
 
 
 class PersonDetector:
-    def __init__(self, model_path="models/person_detection.tflite"):
+    """
+    TFLite person classifier.
+
+    Frames are resized and color-converted straight into the interpreter's
+    input tensor, so an inference allocates no intermediate arrays. uint8
+    models get raw pixels, int8 models pixels - 128, float models
+    (pixel - input_mean) / input_std. detect() runs synchronously and may
+    be called from any thread (the interpreter is behind a lock); start()
+    adds a worker thread that always processes the newest submitted frame
+    and drops any that went stale meanwhile.
+    """
+
+    # Float model normalization, the usual TFLite image convention: [-1, 1]
+    input_mean = 127.5
+    input_std = 127.5
+
+    def __init__(self, model_path="models/person_detection.tflite", num_threads=None, threshold=0.6):
+        self.threshold = threshold
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.enabled = False
+        self.interpreter = None
+        self._interpreter_lock = threading.Lock()  # TFLite interpreters aren't thread-safe
+
+        self._cond = threading.Condition()
+        self._pending = None  # newest (frame, timestamp) not yet analyzed
+        self._thread = None
+        self._running = False
+        self._listeners: List[Callable[[Dict], None]] = []
+        self.latest_result: Optional[Dict] = None
+        self._stats = {"submitted": 0, "processed": 0, "dropped": 0, "latency_ms_total": 0.0,
+                       "last_latency_ms": 0.0}
+
         if not TFLITE_AVAILABLE:
             logger.warning("[AI] tflite_runtime not available. Person detection disabled.")
-            self.interpreter = None
-            self.enabled = False
             return
-        
+
         if not os.path.exists(model_path):
             logger.warning("[AI] Model file missing. Disabling AI features.")
-            self.interpreter = None
-            self.enabled = False
             return
 
-        self.interpreter = tflite.Interpreter(model_path=model_path)
+        self.interpreter = tflite.Interpreter(model_path=model_path, num_threads=self.num_threads)
         self.interpreter.allocate_tensors()
         self.enabled = True
 
@@ -34,19 +64,113 @@ class PersonDetector:
         self.input_index = input_details[0]["index"]
         self.output_index = output_details[0]["index"]
         self.input_shape = input_details[0]["shape"]
+        self.input_dtype = input_details[0]["dtype"]
+
+        # Reused for every frame: the resized BGR image before conversion
+        h, w = self.input_shape[1], self.input_shape[2]
+        self._resized = np.empty((h, w, 3), dtype=np.uint8)
+        self._rgb = np.empty((h, w, 3), dtype=np.uint8)
+        logger.info(f"[AI] Person detector loaded ({w}x{h}, {self.num_threads} threads)")
 
-    def has_person(self, frame, threshold=0.6):
+    def _fill_input(self, frame):
+        h, w = self._resized.shape[:2]
+        cv2.resize(frame, (w, h), dst=self._resized)
+        # View of the interpreter's own buffer; must be released before invoke()
+        input_tensor = self.interpreter.tensor(self.input_index)()[0]
+        if self.input_dtype == np.uint8:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=input_tensor)
+        elif self.input_dtype == np.int8:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            # pixel - 128 as int8 is the pixel with its top bit flipped
+            np.bitwise_xor(self._rgb, 0x80, out=self._rgb)
+            np.copyto(input_tensor, self._rgb.view(np.int8))
+        else:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            np.subtract(self._rgb, self.input_mean, out=input_tensor, casting="unsafe")
+            input_tensor /= self.input_std
+        del input_tensor
+
+    def detect(self, frame) -> float:
+        """Person probability for one BGR frame (0.0 when disabled)."""
         if not self.enabled:
-            return False
+            return 0.0
+        with self._interpreter_lock:
+            self._fill_input(frame)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_index)
+        return float(output.flatten()[0])  # assuming person probability
 
-        h, w = self.input_shape[1], self.input_shape[2]
-        img = cv2.resize(frame, (w, h))
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = np.expand_dims(img, axis=0).astype(np.uint8)
+    def has_person(self, frame, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        return self.detect(frame) >= threshold
+
+    # -- background worker -------------------------------------------------
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Register callback(result) run on the worker thread after each inference."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if not self.enabled or self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="person-detector")
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def submit(self, frame, timestamp=None):
+        """Queue a frame for the worker; replaces (and drops) any frame still waiting."""
+        if not self.enabled:
+            return
+        with self._cond:
+            if self._pending is not None:
+                self._stats["dropped"] += 1
+            self._pending = (frame, timestamp if timestamp is not None else time.time())
+            self._stats["submitted"] += 1
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                frame, timestamp = self._pending
+                self._pending = None
+
+            started = time.perf_counter()
+            try:
+                probability = self.detect(frame)
+            except Exception as e:
+                logger.error(f"[AI] Person inference failed: {e}")
+                continue
+            latency_ms = (time.perf_counter() - started) * 1000.0
 
-        self.interpreter.set_tensor(self.input_index, img)
-        self.interpreter.invoke()
-        output = self.interpreter.get_tensor(self.output_index)
+            result = {
+                "timestamp": timestamp,
+                "probability": probability,
+                "person": probability >= self.threshold,
+                "latency_ms": latency_ms,
+            }
+            with self._cond:
+                self._stats["processed"] += 1
+                self._stats["latency_ms_total"] += latency_ms
+                self._stats["last_latency_ms"] = latency_ms
+                self.latest_result = result
+            for callback in list(self._listeners):
+                try:
+                    callback(result)
+                except Exception as e:
+                    logger.error(f"[AI] Person result listener failed: {e}")
 
-        prob = float(output.flatten()[0])  # assuming person probability
-        return prob >= threshold
+    def stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+        processed = stats["processed"] or 1
+        stats["avg_latency_ms"] = round(stats.pop("latency_ms_total") / processed, 2)
+        stats["drop_rate"] = round(stats["dropped"] / stats["submitted"], 3) if stats["submitted"] else 0.0
+        return stats
@@ -0,0 +1,88 @@
+"""
+Throughput and peak-memory benchmark for recording encryption.
+
+Compares the previous whole-file Fernet encryption with the chunked
+streaming encrypt_file(). Each run happens in a fresh subprocess so that
+peak RSS (ru_maxrss) reflects only that implementation.
+
+Usage:
+    python benchmarks/bench_encryptor.py [--size-mb 64]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEV_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _legacy_encrypt(in_path: str, out_dir: str) -> str:
+    """The previous implementation: read everything, one Fernet token."""
+    from cryptography.fernet import Fernet
+
+    key_path = os.path.join("config", "storage_key.key")
+    os.makedirs("config", exist_ok=True)
+    if not os.path.exists(key_path):
+        with open(key_path, "wb") as f:
+            f.write(Fernet.generate_key())
+    with open(key_path, "rb") as f:
+        cipher = Fernet(f.read())
+    with open(in_path, "rb") as f:
+        data = f.read()
+    out_path = os.path.join(out_dir, os.path.basename(in_path) + ".enc")
+    with open(out_path, "wb") as f:
+        f.write(cipher.encrypt(data))
+    return out_path
+
+
+def _child(mode: str, in_path: str, out_dir: str):
+    sys.path.insert(0, DEV_DIR)
+    if mode == "legacy":
+        encrypt = _legacy_encrypt
+    else:
+        from encryptor import encrypt_file as encrypt
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    encrypt(in_path, out_dir)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"elapsed": elapsed, "peak_kb": peak, "baseline_kb": baseline}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "IN", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as work:
+        in_path = os.path.join(work, "clip.mjpeg")
+        with open(in_path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f"Input: {args.size_mb} MB")
+        for mode in ("legacy", "chunked"):
+            out_dir = os.path.join(work, mode)
+            os.makedirs(out_dir)
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, in_path, out_dir],
+                cwd=work, capture_output=True, text=True, check=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            mb_s = args.size_mb / stats["elapsed"]
+            print(f"{mode:>8}: {mb_s:8.1f} MB/s, peak RSS {stats['peak_kb'] / 1024:7.1f} MB "
+                  f"(+{(stats['peak_kb'] - stats['baseline_kb']) / 1024:.1f} MB during encryption)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latency benchmark for face_detector.detect_faces: full frame vs ROI mode.
+
+Runs the Haar cascade over a 1536x864 frame, once over the whole frame at
+full resolution and once restricted to a few person-sized regions searched
+at the reduced ROI working scale, with OpenCV limited to one thread.
+
+Usage:
+    python benchmarks/bench_face_detector.py [--image photo.jpg] [--region x,y,w,h ...] [--runs N]
+
+Without --image a synthetic textured frame is used (timings only, no
+faces). Without --region, two 360x600 regions are used.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_detector import detect_faces
+
+
+def synthetic_frame(width: int = 1536, height: int = 864):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(frame, (9, 9), 0)
+
+
+def bench(name: str, frame, runs: int, regions=None):
+    detect_faces(frame, regions)  # warm up
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        faces = detect_faces(frame, regions)
+    elapsed = (time.perf_counter() - t0) / runs
+    print(f"{name:>10}: {elapsed * 1000:8.1f} ms/frame ({1 / elapsed:6.1f} fps), {len(faces)} faces")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image")
+    parser.add_argument("--region", action="append", default=[],
+                        help="x,y,w,h in full-frame pixels (repeatable)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    if args.image:
+        frame = cv2.resize(cv2.imread(args.image), (1536, 864), interpolation=cv2.INTER_AREA)
+    else:
+        frame = synthetic_frame()
+    regions = [tuple(int(v) for v in r.split(",")) for r in args.region] or [(200, 150, 360, 600),
+                                                                                (900, 200, 360, 600)]
+    print(f"1536x864 frame, {len(regions)} regions, 1 OpenCV thread")
+
+    bench("full", frame, args.runs)
+    bench("roi", frame, args.runs, regions)
+
+
+if __name__ == "__main__":
+    main()
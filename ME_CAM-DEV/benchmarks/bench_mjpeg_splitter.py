@@ -0,0 +1,99 @@
+"""
+Throughput benchmark for the MJPEG frame splitter.
+
+Feeds a recorded MJPEG byte stream (e.g. captured with
+``libcamera-vid -t 10000 --codec mjpeg -o capture.mjpeg``) through the old
+1 KB read / find-from-start / slice-and-delete loop and through
+MJPEGFrameSplitter, and reports MB/s and frames/s for each.
+
+Usage:
+    python benchmarks/bench_mjpeg_splitter.py [capture.mjpeg] [--repeat N]
+
+Without a capture file a synthetic stream of 1536x864-sized frames is used.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mjpeg_splitter import MJPEGFrameSplitter, SOI, EOI
+
+
+def synthetic_stream(frames: int = 300, frame_size: int = 120_000) -> bytes:
+    rng = random.Random(0)
+    parts = []
+    for _ in range(frames):
+        body = bytes(rng.getrandbits(8) for _ in range(256)) * (frame_size // 256)
+        parts.append(SOI + body.replace(EOI, b"\xff\x00") + EOI)
+    return b"".join(parts)
+
+
+def legacy_split(stream) -> int:
+    """The original LibcameraMJPEGStreamer._reader_loop parsing logic."""
+    buffer = bytearray()
+    count = 0
+    while True:
+        chunk = stream.read(1024)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        while True:
+            start = buffer.find(SOI)
+            if start == -1:
+                buffer.clear()
+                break
+            end = buffer.find(EOI, start + 2)
+            if end == -1:
+                if start > 0:
+                    del buffer[:start]
+                break
+            frame = buffer[start:end + 2]
+            del buffer[:end + 2]
+            count += 1
+    return count
+
+
+def splitter_split(stream) -> int:
+    splitter = MJPEGFrameSplitter()
+    count = 0
+    for _ in splitter.iter_stream(stream):
+        count += 1
+    return count
+
+
+def run(name, func, data: bytes, repeat: int):
+    best = None
+    frames = 0
+    for _ in range(repeat):
+        stream = io.BytesIO(data)
+        t0 = time.perf_counter()
+        frames = func(stream)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    mb = len(data) / (1024 * 1024)
+    print(f"{name:>10}: {frames} frames, {mb / best:8.1f} MB/s, {frames / best:8.1f} frames/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="?", help="recorded MJPEG byte stream")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_stream()
+
+    print(f"Input: {len(data) / (1024 * 1024):.1f} MB")
+    run("legacy", legacy_split, data, args.repeat)
+    run("splitter", splitter_split, data, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Load test for /stream.mjpg with 1, 10 and 50 concurrent viewers.
+
+By default a server is started in a child process with a synthetic frame
+source (no camera needed), once with the asyncio server (web/async_server.py)
+and once with a thread-per-viewer WSGI server like the old app.run() mode.
+For each viewer count it reports server CPU, RSS and thread count and the
+frame rate delivered to each viewer.
+
+To load a running device instead, pass its URL, its PID (CPU/RSS are read
+from /proc, so run this on the device) and a logged-in session cookie:
+
+    python benchmarks/load_test_stream.py --url http://127.0.0.1:8080/stream.mjpg \\
+        --pid $(pgrep -f main.py) --cookie "session=..."
+
+Usage:
+    python benchmarks/load_test_stream.py [--viewers 1 10 50] [--duration 10]
+        [--fps 15] [--frame-kb 150] [--servers async threaded]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEV_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DEV_DIR)
+sys.path.insert(0, os.path.join(DEV_DIR, "web"))
+
+BOUNDARY = b"--frame\r\n"
+
+
+# -- synthetic server (child process) ------------------------------------
+
+def _synthetic_source(fps: int, frame_kb: int):
+    from frame_broadcaster import FrameBroadcaster
+
+    broadcaster = FrameBroadcaster()
+    frame = b"\xff\xd8" + os.urandom(frame_kb * 1024).replace(b"--frame", b"--fram_") + b"\xff\xd9"
+
+    def publish():
+        interval = 1.0 / fps
+        next_due = time.monotonic()
+        while True:
+            broadcaster.publish(frame)
+            next_due += interval
+            time.sleep(max(0.0, next_due - time.monotonic()))
+
+    threading.Thread(target=publish, daemon=True).start()
+    return broadcaster
+
+
+def _serve(kind: str, port: int, fps: int, frame_kb: int):
+    broadcaster = _synthetic_source(fps, frame_kb)
+
+    def not_found(environ, start_response):
+        start_response("404 Not Found", [("Content-Length", "0")])
+        return [b""]
+
+    if kind == "async":
+        from async_server import AsyncAppServer
+
+        class OpenServer(AsyncAppServer):
+            def _session_authenticated(self, headers):
+                return True
+
+        OpenServer(not_found, lambda w, f, q: broadcaster.frames(), host="127.0.0.1", port=port).run()
+    else:
+        from werkzeug.serving import make_server
+
+        def app(environ, start_response):
+            if environ["PATH_INFO"] != "/stream.mjpg":
+                return not_found(environ, start_response)
+            start_response("200 OK", [("Content-Type", "multipart/x-mixed-replace; boundary=frame")])
+            return (BOUNDARY + b"Content-Type: image/jpeg\r\n\r\n" + f + b"\r\n" for f in broadcaster.frames() if f)
+
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+# -- process metrics ------------------------------------------------------
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _status(pid: int, key: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+# -- viewers ---------------------------------------------------------------
+
+async def _viewer(host: str, port: int, path: str, cookie: str, counts: list, slot: int, stop: asyncio.Event):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+    if cookie:
+        request += f"Cookie: {cookie}\r\n"
+    writer.write((request + "\r\n").encode())
+    tail = b""
+    try:
+        while not stop.is_set():
+            data = await reader.read(256 * 1024)
+            if not data:
+                break
+            window = tail + data
+            counts[slot] += window.count(BOUNDARY)
+            tail = window[-(len(BOUNDARY) - 1):]
+    finally:
+        writer.close()
+
+
+async def _run_level(host, port, path, cookie, viewers: int, warmup: float, duration: float, pid: int):
+    counts = [0] * viewers
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(_viewer(host, port, path, cookie, counts, i, stop)) for i in range(viewers)]
+    await asyncio.sleep(warmup)
+
+    start_counts = list(counts)
+    cpu0, t0 = _cpu_seconds(pid), time.monotonic()
+    await asyncio.sleep(duration)
+    cpu1, t1 = _cpu_seconds(pid), time.monotonic()
+    end_counts = list(counts)
+    rss_mb = _status(pid, "VmRSS") / 1024
+    threads = _status(pid, "Threads")
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    fps = [(e - s) / (t1 - t0) for s, e in zip(start_counts, end_counts)]
+    return {
+        "cpu_pct": 100.0 * (cpu1 - cpu0) / (t1 - t0),
+        "rss_mb": rss_mb,
+        "threads": threads,
+        "fps_min": min(fps),
+        "fps_avg": sum(fps) / len(fps),
+    }
+
+
+def _report(label: str, viewers: int, r: dict):
+    print(f"{label:>9} {viewers:>7} {r['cpu_pct']:>7.1f} {r['rss_mb']:>8.1f} {r['threads']:>8} "
+          f"{r['fps_avg']:>8.2f} {r['fps_min']:>8.2f}")
+
+
+def _wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--frame-kb", type=int, default=150)
+    parser.add_argument("--servers", nargs="+", default=["async", "threaded"], choices=["async", "threaded"])
+    parser.add_argument("--url", help="load an already running server instead of a synthetic one")
+    parser.add_argument("--pid", type=int, help="PID of the server given by --url")
+    parser.add_argument("--cookie", default="", help="Cookie header for --url (a logged-in session)")
+    parser.add_argument("--serve", nargs=2, metavar=("KIND", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve[0], int(args.serve[1]), args.fps, args.frame_kb)
+        return
+
+    print(f"{'server':>9} {'viewers':>7} {'cpu %':>7} {'rss MB':>8} {'threads':>8} {'fps avg':>8} {'fps min':>8}")
+    if args.url:
+        if not args.pid:
+            parser.error("--url needs --pid")
+        url = urlsplit(args.url)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        for viewers in args.viewers:
+            result = asyncio.run(_run_level(url.hostname, url.port or 80, path, args.cookie, viewers,
+                                            args.warmup, args.duration, args.pid))
+            _report("device", viewers, result)
+        return
+
+    for kind in args.servers:
+        for viewers in args.viewers:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            child = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", kind, str(port),
+                 "--fps", str(args.fps), "--frame-kb", str(args.frame_kb)],
+                cwd=DEV_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_for_port(port)
+                result = asyncio.run(_run_level("127.0.0.1", port, "/stream.mjpg", "", viewers,
+                                                args.warmup, args.duration, child.pid))
+                _report(kind, viewers, result)
+            finally:
+                child.terminate()
+                child.wait()
+
+
+if __name__ == "__main__":
+    main()
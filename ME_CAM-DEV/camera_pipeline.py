@@ -1,14 +1,41 @@
+import os
+import queue
 import threading
 import time
-from typing import Generator, Optional
+from typing import Callable, Dict, Generator, List, Optional, Tuple
+
+import cv2
+import numpy as np
 
 from utils.logger import get_logger
-from utils.config_manager import get_config
+from config_manager import get_config, subscribe
 from motion_detector import MotionDetector
 from libcamera_streamer import LibcameraMJPEGStreamer
+from prebuffer import ClipFeed, PreEventBuffer
+from recorder import MotionClipRecorder, SegmentedRecorder
+from encryption_queue import get_encryption_service
+from recordings_index import get_recordings_index
+from storage_accounting import get_storage_accountant
+from thumbnail_cache import get_thumbnail_cache
+from stream_variants import StreamVariantManager
+from ai_person_detector import PersonDetector
+from detection_cascade import DetectionCascade
+from face_recognition_whitelist import FaceWhitelist
+from smart_motion_filter import SmartMotionFilter
+from notifications.dispatcher import get_notification_dispatcher
 
 logger = get_logger("camera_pipeline")
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# imdecode modes that let libjpeg decode straight to a reduced-size gray image
+_GRAY_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
 
 class CameraPipeline:
     """
@@ -18,16 +45,47 @@ class CameraPipeline:
     - Configuration (resolution, fps)
     """
 
-    def __init__(self):
+    def __init__(self, stop_event: Optional[threading.Event] = None):
         self._lock = threading.Lock()
+        self._stop_event = stop_event or threading.Event()
         self._streamer: Optional[LibcameraMJPEGStreamer] = None
-        self._motion_detector = MotionDetector()
+        self._variants: Optional[StreamVariantManager] = None
         self._running = False
 
+        self._motion_listeners: List[Callable[[bytes, float], None]] = []
+        self._stats = {"analyzed": 0, "skipped": 0, "motion_events": 0, "analysis_ms": 0.0}
+
         self._load_stream_config()
+        self._load_detection_config()
+
+        storage = get_config().get("storage", {})
+        self._prebuffer = PreEventBuffer(
+            max_seconds=float(storage.get("prebuffer_seconds", 5)),
+            max_bytes=int(float(storage.get("prebuffer_max_mb", 24)) * 1024 * 1024),
+        )
+        self._clip_recorder = MotionClipRecorder(
+            self.open_clip,
+            SegmentedRecorder(
+                os.path.join(BASE_DIR, storage.get("recordings_dir", "recordings")),
+                segment_seconds=float(storage.get("segment_seconds", 60)),
+                on_segment_closed=self._on_segment_closed,
+            ),
+            post_event_seconds=float(storage.get("post_event_seconds", 10)),
+        )
+        # Thumbnail + encryption handoff for closed segments. submit() blocks
+        # while the encryption queue is full, and that must not stall the
+        # recorder thread, or its clip feed overflows and drops live frames
+        self._closed_segments: "queue.Queue[Tuple[str, float, float]]" = queue.Queue()
+        threading.Thread(target=self._encrypt_segments, daemon=True, name="segment-encrypt").start()
+        self._cascade = self._build_cascade()
+        self._cascade.add_listener(self._record_event)
+        self._cascade.add_listener(self._notify_event)
+        self.add_motion_listener(self._cascade.on_motion)
+        subscribe(self._on_config_changed)
 
     def _load_stream_config(self):
         config = get_config()
+        self._stream_config_seen = (config.get("stream_resolution"), config.get("stream_fps"))
         resolution = config.get("stream_resolution", "1536x864")
         fps = int(config.get("stream_fps", 15))
 
@@ -44,6 +102,130 @@ class CameraPipeline:
         self._fps = fps
         logger.info(f"[PIPELINE] Using resolution {width}x{height} at {fps} fps")
 
+    def _load_detection_config(self):
+        detection = get_config().get("detection", {})
+        scale = int(detection.get("decode_scale", 4))
+        if scale not in _GRAY_DECODE_FLAGS:
+            logger.warning(f"[PIPELINE] Unsupported decode_scale {scale}, using 4")
+            scale = 4
+
+        self._decode_flag = _GRAY_DECODE_FLAGS[scale]
+        self._analyze_every = max(1, int(detection.get("analyze_every_n_frames", 3)))
+        # Fraction of one core the analysis loop may use (0 < budget <= 1)
+        self._cpu_budget = min(1.0, max(0.01, float(detection.get("cpu_budget", 0.25))))
+
+        # min_motion_area is expressed in full-resolution pixels
+        min_area = int(detection.get("min_motion_area", 500))
+        self._motion_detector = MotionDetector(
+            sensitivity=float(detection.get("sensitivity", 0.5)),
+            min_area=max(1, min_area // (scale * scale)),
+            mode=detection.get("motion_mode", "running_average"),
+            roi=detection.get("roi"),
+        )
+
+    def _build_cascade(self) -> DetectionCascade:
+        detection = get_config().get("detection", {})
+        person_only = bool(detection.get("person_only", True))
+        face_enabled = bool(detection.get("face_whitelist_enabled", False))
+        person_detector = None
+        if person_only or face_enabled:
+            person_detector = PersonDetector(
+                model_path=os.path.join(BASE_DIR, detection.get("person_model", "models/person_detection.tflite")),
+                num_threads=int(detection.get("person_threads", 2)),
+                threshold=float(detection.get("person_threshold", 0.6)),
+            )
+        return DetectionCascade(
+            person_detector=person_detector,
+            face_whitelist=FaceWhitelist(os.path.join(BASE_DIR, "faces", "whitelist"), enabled=face_enabled),
+            motion_filter=SmartMotionFilter(
+                window_seconds=float(detection.get("motion_filter_window_seconds", 5)),
+                min_events=int(detection.get("motion_filter_min_events", 2)),
+            ),
+            person_only=person_only,
+            person_interval=float(detection.get("person_min_interval_seconds", 1.0)),
+            face_interval=float(detection.get("face_min_interval_seconds", 10.0)),
+        )
+
+    def _record_event(self, frame: bytes, timestamp: float, event: Dict):
+        """Cascade listener: start or extend a clip, except for follow-ups and whitelisted faces."""
+        if event.get("followup"):
+            return
+        face = event.get("face")
+        if face and face.get("whitelisted"):
+            return
+        self._clip_recorder.on_motion(frame, timestamp)
+
+    def _notify_event(self, frame: bytes, timestamp: float, event: Dict):
+        """Cascade listener: queue an email alert; the dispatcher sends it in the background."""
+        config = get_config()
+        if not config.get("notifications", {}).get("email_on_motion") or event.get("followup"):
+            return
+        face = event.get("face")
+        if face and face.get("whitelisted"):
+            return
+        what = "Person" if event.get("person") else "Motion"
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+        body = f"{what} detected at {when}."
+        if event.get("person"):
+            body += f"\nPerson probability: {event['person']:.2f}"
+        if face:
+            body += f"\nFaces: {face['faces']} (not whitelisted)"
+        get_notification_dispatcher().submit(
+            f"[{config.get('device_name', 'ME_CAM')}] {what} detected", body,
+            attachments=[(f"snapshot_{int(timestamp)}.jpg", frame)],
+        )
+
+    def _on_segment_closed(self, path: str, info: dict):
+        st = os.stat(path)
+        accountant = get_storage_accountant()
+        accountant.record_write(path, st.st_size)
+        accountant.record_write(info["index_path"], os.path.getsize(info["index_path"]))
+        get_recordings_index().add(path, size=st.st_size, mtime=st.st_mtime, duration=info["duration"],
+                                   encrypted=False, clip_id=info["recording_id"])
+
+        if get_config().get("storage", {}).get("encrypt", False):
+            self._closed_segments.put((path, st.st_size, st.st_mtime))
+        else:
+            # Have the thumbnail ready before anyone opens the dashboard
+            get_thumbnail_cache().request(path, st.st_size, st.st_mtime)
+
+    def _encrypt_segments(self):
+        while True:
+            path, size, mtime = self._closed_segments.get()
+            # The plaintext segment is deleted once encrypted, so take the thumbnail first
+            try:
+                get_thumbnail_cache().generate(path, size, mtime)
+            except Exception as e:
+                logger.warning(f"[PIPELINE] Thumbnail for {path} failed: {e}")
+            try:
+                # Blocks while the encryption queue is full (backpressure)
+                get_encryption_service().submit(path)
+            except Exception as e:
+                logger.error(f"[PIPELINE] Queueing {path} for encryption failed: {e}")
+
+    def add_motion_listener(self, callback: Callable[[bytes, float], None]):
+        """Register callback(jpeg_frame, timestamp) invoked when motion is detected."""
+        self._motion_listeners.append(callback)
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self._stats)
+        stats["prebuffer"] = self._prebuffer.stats()
+        stats["recording"] = self._clip_recorder.recording
+        stats["recording_dropped_frames"] = self._clip_recorder.dropped_frames
+        stats["segments_awaiting_encryption"] = self._closed_segments.qsize()
+        stats["cascade"] = self._cascade.stats()
+        stats["notifications"] = get_notification_dispatcher().stats()
+        return stats
+
+    def open_clip(self, after: Optional[float] = None) -> ClipFeed:
+        """
+        Start a clip that begins with the buffered pre-event frames (those
+        captured after ``after``, if given) and then follows the live stream
+        until the returned feed is closed.
+        """
+        self._ensure_streamer()
+        return self._prebuffer.open_clip(after)
+
     def _ensure_streamer(self):
         if self._streamer is None:
             self._streamer = LibcameraMJPEGStreamer(
@@ -51,11 +233,22 @@ class CameraPipeline:
                 height=self._height,
                 fps=self._fps,
             )
+            self._streamer.broadcaster.add_listener(self._prebuffer.append)
             self._streamer.start()
+            self._variants = StreamVariantManager(
+                self._streamer.broadcaster,
+                source_width=self._width,
+                source_fps=self._fps,
+            )
+
+    def _on_config_changed(self, config):
+        if (config.get("stream_resolution"), config.get("stream_fps")) != self._stream_config_seen:
+            self.update_stream_settings()
 
     def update_stream_settings(self):
         """
-        Called when config is changed via /config in the web UI.
+        Restart the stream with the configured resolution/fps. Runs on
+        every config save that changes them.
         """
         with self._lock:
             self._load_stream_config()
@@ -66,28 +259,82 @@ class CameraPipeline:
                     height=self._height,
                     fps=self._fps,
                 )
+            if self._variants:
+                self._variants.update_source(self._width, self._fps)
+
+    def _analyze(self, frame: bytes) -> bool:
+        gray = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), self._decode_flag)
+        if gray is None:
+            return False
+        return self._motion_detector.detect_gray(gray)
 
     def run(self):
         """
-        Optional background pipeline work (e.g., motion detection on frames).
-        You can expand this later if you want motion detection to run in the background.
+        Background motion detection on the live stream.
+
+        Frames are decoded straight to small grayscale images. Only every Nth
+        frame is analyzed, and analysis is further throttled so that it uses at
+        most ``detection.cpu_budget`` of one core.
         """
         logger.info("[PIPELINE] Camera pipeline started.")
         self._running = True
         self._ensure_streamer()
+        broadcaster = self._streamer.broadcaster
 
-        # Example: background loop that could run motion detection, etc.
-        while self._running:
-            time.sleep(0.5)
+        last_seq = broadcaster.seq
+        frame_count = 0
+        next_allowed = 0.0
+
+        while self._running and not self._stop_event.is_set():
+            seq, frame = broadcaster.wait_for_frame(last_seq, timeout=1.0)
+            if frame is None:
+                continue
+            # Frames published while we were busy were never looked at
+            self._stats["skipped"] += max(0, seq - last_seq - 1)
+            last_seq = seq
+            frame_count += 1
+
+            now = time.monotonic()
+            if frame_count % self._analyze_every or now < next_allowed:
+                self._stats["skipped"] += 1
+                continue
+
+            started = time.thread_time()
+            try:
+                motion = self._analyze(frame)
+            except Exception as e:
+                logger.warning(f"[PIPELINE] Motion analysis failed: {e}")
+                motion = False
+            cost = time.thread_time() - started
+
+            self._stats["analyzed"] += 1
+            self._stats["analysis_ms"] = round(cost * 1000, 2)
+            # Idle long enough that cost / (cost + idle) stays within budget
+            next_allowed = time.monotonic() + cost * (1.0 / self._cpu_budget - 1.0)
+
+            if motion:
+                self._stats["motion_events"] += 1
+                timestamp = time.time()
+                for callback in list(self._motion_listeners):
+                    try:
+                        callback(frame, timestamp)
+                    except Exception as e:
+                        logger.error(f"[PIPELINE] Motion listener failed: {e}")
+
+        logger.info("[PIPELINE] Camera pipeline stopped.")
 
     def stop(self):
         self._running = False
         if self._streamer:
             self._streamer.stop()
 
-    def mjpeg_frames(self) -> Generator[bytes, None, None]:
+    def mjpeg_frames(self, width: Optional[int] = None, fps: Optional[int] = None,
+                     quality: Optional[int] = None) -> Generator[bytes, None, None]:
         """
         Frame generator used by Flask MJPEG endpoint.
+
+        Passing width/fps/quality selects a shared downscaled variant instead
+        of the full-resolution source stream.
         """
         self._ensure_streamer()
         if not self._streamer:
@@ -96,7 +343,9 @@ class CameraPipeline:
                 time.sleep(0.5)
                 yield b""
 
-        for frame in self._streamer.frames():
-            # Optionally run motion detection here on the JPEG frame if needed
-            # self._motion_detector.process_frame(...)
-            yield frame
+        variant = self._variants.get(width, fps, quality) if self._variants else None
+        if variant is not None:
+            yield from variant.frames()
+            return
+
+        yield from self._streamer.frames()
@@ -1,5 +1,4 @@
-import smtplib
-from email.mime.text import MIMEText
+from notifications.dispatcher import NotificationDispatcher
 from utils.logger import get_logger
 
 logger = get_logger("email_notifier")
@@ -7,7 +6,8 @@ logger = get_logger("email_notifier")
 
 class EmailNotifier:
     def __init__(self, enabled: bool = False, smtp_host: str = "", smtp_port: int = 587,
-                 username: str = "", password: str = "", from_addr: str = "", to_addr: str = ""):
+                 username: str = "", password: str = "", from_addr: str = "", to_addr: str = "",
+                 coalesce_window: float = 30.0):
         self.enabled = enabled
         self.smtp_host = smtp_host
         self.smtp_port = smtp_port
@@ -15,21 +15,21 @@ class EmailNotifier:
         self.password = password
         self.from_addr = from_addr
         self.to_addr = to_addr
+        self.dispatcher = NotificationDispatcher({
+            "enabled": enabled,
+            "smtp_server": smtp_host,
+            "smtp_port": smtp_port,
+            "username": username,
+            "password": password,
+            "from_address": from_addr,
+            "to_address": to_addr,
+        }, coalesce_window=coalesce_window)
 
-    def send_alert(self, subject: str, body: str):
+    def send_alert(self, subject: str, body: str, attachments=None) -> bool:
+        """Queue the alert; it is sent (possibly merged into a digest) in the background."""
         if not self.enabled:
-            return
-
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = self.from_addr
-        msg["To"] = self.to_addr
-
-        try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as s:
-                s.starttls()
-                s.login(self.username, self.password)
-                s.send_message(msg)
-            logger.info("Alert email sent.")
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
+            return False
+        if not self.dispatcher.submit(subject, body, attachments):
+            logger.error("Failed to queue alert email.")
+            return False
+        return True
@@ -1,57 +1,165 @@
 import json
 import os
-from threading import RLock
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Tuple
 
-CONFIG_PATH = "config/config.json"
-DEFAULT_CONFIG_PATH = "config/config_default.json"
+from utils.logger import get_logger
 
-_lock = RLock()
-_config_cache = None
+logger = get_logger("config_manager")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, "config", "config.json")
+DEFAULT_CONFIG_PATH = os.path.join(BASE_DIR, "config", "config_default.json")
+
+# Published state: (version, immutable snapshot). Readers just load this
+# reference, which is atomic, so get_config() never takes the lock. Writers
+# build a whole new snapshot and swap it in under _write_lock.
+_state: Optional[Tuple[int, Mapping[str, Any]]] = None
+_write_lock = Lock()
+_subscribers: List[Callable[[Mapping[str, Any]], None]] = []
 
 
 def _load_json(path):
     if not os.path.exists(path):
         return {}
-    with open(path, "r") as f:
-        return json.load(f)
-
-
-def get_config():
-    global _config_cache
-    with _lock:
-        if _config_cache is None:
-            os.makedirs("config", exist_ok=True)
-            if not os.path.exists(CONFIG_PATH):
-                default = _load_json(DEFAULT_CONFIG_PATH)
-                with open(CONFIG_PATH, "w") as f:
-                    json.dump(default, f, indent=2)
-                _config_cache = default
-            else:
-                _config_cache = _load_json(CONFIG_PATH)
-        return _config_cache
-
-
-def save_config(new_config: dict):
-    global _config_cache
-    with _lock:
-        os.makedirs("config", exist_ok=True)
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(new_config, f, indent=2)
-        _config_cache = new_config
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"[CONFIG] Failed to load {path}: {e}")
+        return {}
+
+
+def _merge(defaults: dict, overrides: dict) -> dict:
+    """Defaults with overrides applied, recursing into nested sections."""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _write_atomic(config: dict):
+    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
+    tmp_path = CONFIG_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CONFIG_PATH)
+
+
+def _publish(config: dict) -> Mapping[str, Any]:
+    """Swap in a new snapshot; caller holds _write_lock."""
+    global _state
+    snapshot = _freeze(config)
+    _state = ((_state[0] + 1) if _state else 1, snapshot)
+    return snapshot
+
+
+def _notify(snapshot: Mapping[str, Any]):
+    for callback in list(_subscribers):
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.warning(f"[CONFIG] Subscriber {callback} failed: {e}")
+
+
+def _load():
+    with _write_lock:
+        if _state is not None:
+            return
+        defaults = _load_json(DEFAULT_CONFIG_PATH)
+        if os.path.exists(CONFIG_PATH):
+            config = _merge(defaults, _load_json(CONFIG_PATH))
+        else:
+            logger.info(f"[CONFIG] Creating default config at {CONFIG_PATH}")
+            config = defaults
+            _write_atomic(config)
+        _publish(config)
+
+
+def get_config() -> Mapping[str, Any]:
+    """
+    Current configuration as a read-only snapshot.
+
+    Nested sections are read-only mappings and lists are tuples. Use
+    get_mutable_config() to build changes and save_config() to apply them.
+    """
+    state = _state
+    if state is None:
+        _load()
+        state = _state
+    return state[1]
+
+
+def config_version() -> int:
+    """Incremented every time a new snapshot is published."""
+    get_config()
+    return _state[0]
+
+
+def get_mutable_config() -> dict:
+    """A private, editable deep copy of the current configuration."""
+    return _thaw(get_config())
+
+
+def save_config(new_config: Mapping[str, Any]):
+    """Write the config atomically, publish it and notify subscribers."""
+    config = _thaw(new_config)
+    with _write_lock:
+        _write_atomic(config)
+        snapshot = _publish(config)
+    logger.info("[CONFIG] Configuration saved.")
+    _notify(snapshot)
+
+
+def reload_config():
+    """Re-read config.json from disk (e.g. after another tool edited it)."""
+    with _write_lock:
+        config = _merge(_load_json(DEFAULT_CONFIG_PATH), _load_json(CONFIG_PATH))
+        snapshot = _publish(config)
+    _notify(snapshot)
+
+
+def subscribe(callback: Callable[[Mapping[str, Any]], None]):
+    """Register callback(snapshot), called after every save or reload."""
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[Mapping[str, Any]], None]):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
 
 
 def update_config(updates: dict):
-    cfg = get_config()
+    cfg = get_mutable_config()
     cfg.update(updates)
     save_config(cfg)
 
 
 def is_first_run():
-    cfg = get_config()
-    return not cfg.get("first_run_completed", False)
+    return not get_config().get("first_run_completed", False)
 
 
 def mark_first_run_complete():
-    cfg = get_config()
-    cfg["first_run_completed"] = True
-    save_config(cfg)
+    update_config({"first_run_completed": True})
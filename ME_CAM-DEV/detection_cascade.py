@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from ai_person_detector import PersonDetector
+from face_recognition_whitelist import FaceWhitelist
+from smart_motion_filter import SmartMotionFilter
+from utils.logger import get_logger
+
+logger = get_logger("detection_cascade")
+
+EventListener = Callable[[bytes, float, Dict], None]
+
+
+class CascadeStage:
+    """Rate limit plus hit and latency counters for one cascade stage."""
+
+    def __init__(self, name: str, min_interval: float = 0.0):
+        self.name = name
+        self.min_interval = min_interval
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"entered": 0, "passed": 0, "rate_limited": 0,
+                       "last_latency_ms": 0.0, "latency_ms_total": 0.0, "timed": 0}
+
+    def admit(self) -> bool:
+        """Count an entry; False if the stage ran too recently."""
+        now = time.monotonic()
+        with self._lock:
+            self._stats["entered"] += 1
+            if now < self._next_allowed:
+                self._stats["rate_limited"] += 1
+                return False
+            self._next_allowed = now + self.min_interval
+            return True
+
+    def record(self, passed: bool, latency_ms: Optional[float] = None):
+        with self._lock:
+            if passed:
+                self._stats["passed"] += 1
+            if latency_ms is not None:
+                self._stats["timed"] += 1
+                self._stats["last_latency_ms"] = round(latency_ms, 2)
+                self._stats["latency_ms_total"] += latency_ms
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        timed = stats.pop("timed") or 1
+        stats["avg_latency_ms"] = round(stats.pop("latency_ms_total") / timed, 2)
+        stats["min_interval_s"] = self.min_interval
+        return stats
+
+
+class DetectionCascade:
+    """
+    Motion -> debounce -> person -> face whitelist, cheapest stage first.
+
+    Register on_motion() as a motion listener. Motion that survives the
+    SmartMotionFilter debounce is handed to the person detector's
+    latest-frame worker; confirmed persons go on to the face whitelist.
+    Every stage has its own minimum interval, so the expensive models run
+    at a bounded rate no matter how much motion there is.
+
+    Listeners receive (jpeg_frame, timestamp, event) for each alert. With
+    ``person_only`` (and a working person model) an alert needs a person,
+    otherwise debounced motion is enough.
+    """
+
+    def __init__(self, person_detector: Optional[PersonDetector] = None,
+                 face_whitelist: Optional[FaceWhitelist] = None,
+                 motion_filter: Optional[SmartMotionFilter] = None,
+                 person_only: bool = True, person_interval: float = 1.0, face_interval: float = 10.0):
+        self.person_detector = person_detector
+        self.face_whitelist = face_whitelist
+        self.motion_filter = motion_filter or SmartMotionFilter()
+        self.person_enabled = bool(person_detector and person_detector.enabled)
+        self.person_only = person_only and self.person_enabled
+        if person_only and not self.person_enabled:
+            logger.warning("[CASCADE] person_only is set but person detection is unavailable; "
+                           "alerting on motion")
+
+        self.stages = {
+            "motion": CascadeStage("motion"),
+            "debounce": CascadeStage("debounce"),
+            "person": CascadeStage("person", person_interval),
+            "face": CascadeStage("face", face_interval),
+        }
+        self._listeners: List[EventListener] = []
+        # Frames handed to the person worker, by timestamp (in flight + pending)
+        self._frames_lock = threading.Lock()
+        self._frames: Dict[float, bytes] = {}
+
+        if self.person_enabled:
+            self.person_detector.add_listener(self._on_person_result)
+            self.person_detector.start()
+
+    def add_listener(self, callback: EventListener):
+        self._listeners.append(callback)
+
+    def _emit(self, frame: bytes, timestamp: float, event: Dict):
+        for callback in list(self._listeners):
+            try:
+                callback(frame, timestamp, event)
+            except Exception as e:
+                logger.error(f"[CASCADE] Listener failed: {e}")
+
+    def on_motion(self, frame: bytes, timestamp: float):
+        """Motion listener: entry point of the cascade (JPEG frame)."""
+        self.stages["motion"].admit()
+        self.stages["motion"].record(True)
+
+        debounce = self.stages["debounce"]
+        debounce.admit()
+        if not self.motion_filter.register_motion():
+            return
+        debounce.record(True)
+
+        if not self.person_only:
+            self._emit(frame, timestamp, {"stage": "motion", "person": None, "face": None, "followup": False})
+        if self.person_enabled and self.stages["person"].admit():
+            with self._frames_lock:
+                self._frames[timestamp] = frame
+            self.person_detector.submit(self._decode(frame), timestamp)
+
+    @staticmethod
+    def _decode(frame: bytes):
+        return cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+
+    def _on_person_result(self, result: Dict):
+        # Runs on the person worker thread
+        with self._frames_lock:
+            frame = self._frames.pop(result["timestamp"], None)
+            # Frames the worker skipped will never get a result
+            for ts in [ts for ts in self._frames if ts < result["timestamp"]]:
+                del self._frames[ts]
+        self.stages["person"].record(result["person"], result["latency_ms"])
+        if not result["person"] or frame is None:
+            return
+
+        event = {"stage": "person", "person": result["probability"], "face": None}
+        if self.face_whitelist is not None and self.face_whitelist.enabled and self.stages["face"].admit():
+            started = time.perf_counter()
+            try:
+                face = self.face_whitelist.match(self._decode(frame))
+            except Exception as e:
+                logger.warning(f"[CASCADE] Face check failed: {e}")
+                face = {"whitelisted": False, "identity": None, "distance": None, "faces": 0}
+            self.stages["face"].record(face["whitelisted"], (time.perf_counter() - started) * 1000.0)
+            event["stage"] = "face"
+            event["face"] = face
+
+        # Without person_only, motion already alerted; this reports what the later stages found
+        event["followup"] = not self.person_only
+        self._emit(frame, result["timestamp"], event)
+
+    def stats(self) -> Dict:
+        stats = {name: stage.stats() for name, stage in self.stages.items()}
+        stats["person_only"] = self.person_only
+        if self.person_enabled:
+            stats["person_worker"] = self.person_detector.stats()
+        return stats
@@ -0,0 +1,269 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Optional, Tuple
+
+from config_manager import get_config
+from recorder import INDEX_EXT, SEGMENT_EXT
+from recordings_index import get_recordings_index
+from storage_accounting import get_storage_accountant
+from utils.logger import get_logger
+
+logger = get_logger("encryption_queue")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB_PATH = os.path.join(BASE_DIR, "config", "encryption_jobs.db")
+FAILED_JOB_RETENTION = 7 * 86400  # failed jobs stay visible for a week; done jobs are dropped
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    src TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    queued_at REAL NOT NULL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+"""
+
+
+def _sha256_chunks(chunks) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_chunks(path: str, size: int = 256 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(size)
+            if not data:
+                return
+            yield data
+
+
+def _encrypt_job(src: str, out_dir: str) -> dict:
+    """
+    Runs in a worker process: encrypt, verify the ciphertext decrypts back
+    to the source, and only then delete the source.
+    """
+    from encryptor import ChunkedDecryptor, encrypt_file
+
+    started = time.time()
+    st = os.stat(src)
+    src_size = st.st_size
+    out_path = encrypt_file(src, out_dir)
+    with ChunkedDecryptor(out_path) as dec:
+        verified = dec.plaintext_size == src_size and _sha256_chunks(dec) == _sha256_chunks(_file_chunks(src))
+    if not verified:
+        os.remove(out_path)
+        raise ValueError(f"Verification failed for {out_path}")
+    # Keep the recording time so the index ordering doesn't change
+    os.utime(out_path, (st.st_atime, st.st_mtime))
+    os.remove(src)
+    return {
+        "out_path": out_path,
+        "src_size": src_size,
+        "out_size": os.path.getsize(out_path),
+        "started": started,
+        "finished": time.time(),
+    }
+
+
+class EncryptionService:
+    """
+    Encrypts recordings off the capture path.
+
+    Jobs are persisted in SQLite so they survive a restart, run on a process
+    pool sized to the Pi's cores, and at most ``max_pending`` jobs may be in
+    flight: submit() blocks beyond that, pushing back on producers.
+    """
+
+    def __init__(self, out_dir: str, workers: Optional[int] = None, max_pending: int = 8,
+                 db_path: str = JOBS_DB_PATH):
+        self.out_dir = out_dir
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        # Forking this multi-threaded process could copy locks held by other
+        # threads (Flask, pipeline, sqlite, logging) into the children
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(method)
+        if method == "forkserver":
+            # The default preload imports __main__ into the fork server; the
+            # workers only need the encryptor
+            context.set_forkserver_preload(["encryptor"])
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.max_pending = max_pending
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        with self._db_lock, self._db:
+            self._db.executescript(_SCHEMA)
+        self._prune()
+
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._queue_latency_total = 0.0
+        self._processing_total = 0.0
+        self._recent: Deque[Tuple[float, int]] = deque()  # (finished, bytes) in the last minute
+
+    def resume(self):
+        """Resubmit jobs left queued by a previous run (in a background thread)."""
+        with self._db_lock:
+            rows = self._db.execute("SELECT id, src FROM jobs WHERE state = 'queued'").fetchall()
+        if not rows:
+            return
+
+        def _resubmit():
+            for job_id, src in rows:
+                if os.path.exists(src):
+                    self._submit_job(job_id, src, time.time())
+                else:
+                    self._finish(job_id, "failed", "source missing after restart")
+
+        logger.info(f"[ENCRYPT] Resuming {len(rows)} queued encryption jobs")
+        threading.Thread(target=_resubmit, daemon=True).start()
+
+    def submit(self, src: str, timeout: Optional[float] = None) -> bool:
+        """
+        Queue ``src`` for encryption. Blocks while ``max_pending`` jobs are in
+        flight; returns False if ``timeout`` expires first.
+        """
+        src = os.path.abspath(src)
+        queued_at = time.time()
+        with self._db_lock, self._db:
+            job_id = self._db.execute(
+                "INSERT INTO jobs (src, queued_at) VALUES (?, ?)", (src, queued_at)
+            ).lastrowid
+        if not self._submit_job(job_id, src, queued_at, timeout):
+            logger.warning(f"[ENCRYPT] Queue full, {src} left for the next resume")
+            return False
+        return True
+
+    def _submit_job(self, job_id: int, src: str, queued_at: float, timeout: Optional[float] = None) -> bool:
+        if not self._slots.acquire(timeout=timeout):
+            return False
+        with self._stats_lock:
+            self._pending += 1
+        future = self._pool.submit(_encrypt_job, src, self.out_dir)
+        future.add_done_callback(lambda f: self._on_done(f, job_id, src, queued_at))
+        return True
+
+    def _finish(self, job_id: int, state: str, error: Optional[str] = None):
+        with self._db_lock, self._db:
+            if state == "done":
+                # Nothing left to resume or report, so don't let the table grow
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            else:
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, error = ? WHERE id = ?",
+                    (state, time.time(), error, job_id),
+                )
+        if state != "done":
+            self._prune()
+
+    def _prune(self):
+        """Drop finished jobs, keeping failures for FAILED_JOB_RETENTION."""
+        with self._db_lock, self._db:
+            self._db.execute(
+                "DELETE FROM jobs WHERE state = 'done' OR (state = 'failed' AND finished_at < ?)",
+                (time.time() - FAILED_JOB_RETENTION,),
+            )
+
+    def _on_done(self, future, job_id: int, src: str, queued_at: float):
+        self._slots.release()
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"[ENCRYPT] Job for {src} failed: {e}")
+            with self._stats_lock:
+                self._pending -= 1
+                self._failed += 1
+            self._finish(job_id, "failed", str(e))
+            return
+
+        with self._stats_lock:
+            self._pending -= 1
+            self._completed += 1
+            self._queue_latency_total += max(0.0, result["started"] - queued_at)
+            self._processing_total += result["finished"] - result["started"]
+            self._recent.append((result["finished"], result["src_size"]))
+        self._finish(job_id, "done")
+
+        # The worker process can't touch this process's bookkeeping
+        accountant = get_storage_accountant()
+        accountant.record_delete(src, result["src_size"])
+        accountant.record_write(result["out_path"], result["out_size"])
+        if src.endswith(SEGMENT_EXT):
+            # The plaintext frame index would outlive the segment it describes
+            index_path = src[:-len(SEGMENT_EXT)] + INDEX_EXT
+            try:
+                index_size = os.path.getsize(index_path)
+                os.remove(index_path)
+                accountant.record_delete(index_path, index_size)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"[ENCRYPT] Could not remove {index_path}: {e}")
+        index = get_recordings_index()
+        previous = index.get_by_path(src)
+        index.remove(src)
+        index.add(
+            result["out_path"],
+            size=result["out_size"],
+            mtime=previous["mtime"] if previous else None,
+            duration=previous["duration"] if previous else None,
+            encrypted=True,
+            thumb_path=previous["thumb_path"] if previous else None,
+        )
+        logger.info(f"[ENCRYPT] {src} encrypted and verified")
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._stats_lock:
+            while self._recent and now - self._recent[0][0] > 60:
+                self._recent.popleft()
+            done = self._completed or 1
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_queue_latency_s": round(self._queue_latency_total / done, 3),
+                "avg_processing_s": round(self._processing_total / done, 3),
+                "throughput_mb_s": round(sum(b for _, b in self._recent) / 60 / (1024 * 1024), 3),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_service: Optional[EncryptionService] = None
+_service_lock = threading.Lock()
+
+
+def get_encryption_service() -> EncryptionService:
+    """Process-wide service writing to the configured encrypted directory."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                storage = get_config().get("storage", {})
+                _service = EncryptionService(
+                    os.path.join(BASE_DIR, storage.get("encrypted_dir", "recordings_encrypted")),
+                    workers=storage.get("encryption_workers"),
+                    max_pending=int(storage.get("encryption_max_pending", 8)),
+                )
+                _service.resume()
+    return _service
@@ -1,8 +1,35 @@
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+import base64
 import os
+import struct
+import threading
+from typing import Iterator, Optional, Tuple
 from loguru import logger
 from config_manager import get_config
 
+# Chunked format written by encrypt_file():
+#   header: magic, version, chunk size, 8-byte nonce prefix, plaintext size
+#   then ceil(size / chunk) AES-GCM chunks of chunk_size + 16 bytes (last may be shorter)
+# Chunk i uses nonce prefix || i and authenticates the header plus a "final"
+# flag; the final chunk also authenticates the plaintext size (version 2), so
+# reordered, truncated or extended files and altered sizes fail to decrypt.
+# Version 1 files (size not in the AAD) are still readable; their size is
+# checked against the file length and the final chunk only.
+# Files without the magic are legacy single-token Fernet files.
+MAGIC = b"MECAMENC"
+VERSION = 2
+_READABLE_VERSIONS = (1, 2)
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+HEADER = struct.Struct("<8sB3xI8sQ")
+_FIXED_HEADER_SIZE = HEADER.size - 8  # everything except the plaintext size
+
+_cipher_lock = threading.Lock()
+_ciphers: Optional[Tuple[str, float, Fernet, AESGCM]] = None
+
 
 def _get_key_path():
     # store key in config folder for persistence
@@ -19,27 +46,210 @@ def _ensure_key():
         return f.read()
 
 
+def _get_ciphers() -> Tuple[Fernet, AESGCM]:
+    """Fernet (legacy) and AES-GCM (chunked) ciphers, cached until the key file changes."""
+    global _ciphers
+    key_path = _get_key_path()
+    mtime = os.path.getmtime(key_path) if os.path.exists(key_path) else None
+    cached = _ciphers
+    if cached and cached[0] == key_path and cached[1] == mtime:
+        return cached[2], cached[3]
+    with _cipher_lock:
+        key = _ensure_key()
+        aes_key = HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=None, info=b"me_cam chunked recording v1"
+        ).derive(base64.urlsafe_b64decode(key))
+        fernet, aesgcm = Fernet(key), AESGCM(aes_key)
+        _ciphers = (key_path, os.path.getmtime(key_path), fernet, aesgcm)
+        return fernet, aesgcm
+
+
+def _nonce(prefix: bytes, index: int) -> bytes:
+    return prefix + struct.pack(">I", index)
+
+
+def _aad(fixed_header: bytes, final: bool, size: Optional[int] = None) -> bytes:
+    aad = fixed_header + (b"\x01" if final else b"\x00")
+    if final and size is not None:
+        aad += struct.pack("<Q", size)
+    return aad
+
+
+def _read_full(src, buf: bytearray) -> int:
+    """readinto() until ``buf`` is full or EOF."""
+    view = memoryview(buf)
+    total = 0
+    while total < len(buf):
+        n = src.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def is_chunked(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
 def encrypt_file(in_path: str, out_dir: str) -> str:
-    """Encrypt a file to the given output directory using Fernet.
+    """Encrypt a file to the given output directory in the chunked format.
 
-    Returns the path of the encrypted file.
+    Streams through fixed-size buffers, so memory use does not depend on
+    the clip length. Returns the path of the encrypted file.
     """
     try:
-        key = _ensure_key()
-        cipher = Fernet(key)
+        _, cipher = _get_ciphers()
         os.makedirs(out_dir, exist_ok=True)
 
-        with open(in_path, "rb") as f:
-            data = f.read()
-
-        encrypted = cipher.encrypt(data)
         base = os.path.basename(in_path)
         out_path = os.path.join(out_dir, base + ".enc")
-        with open(out_path, "wb") as f:
-            f.write(encrypted)
+        tmp_path = out_path + ".part"
+
+        prefix = os.urandom(8)
+        fixed_header = HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, 0)[:_FIXED_HEADER_SIZE]
+        current, lookahead = bytearray(CHUNK_SIZE), bytearray(CHUNK_SIZE)
+        total = 0
+        index = 0
+
+        with open(in_path, "rb") as src, open(tmp_path, "wb") as dst:
+            dst.write(HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, 0))
+            n = _read_full(src, current)
+            while True:
+                # Read one chunk ahead to know whether this one is the last
+                next_n = _read_full(src, lookahead) if n == CHUNK_SIZE else 0
+                final = next_n == 0
+                dst.write(cipher.encrypt(
+                    _nonce(prefix, index), memoryview(current)[:n],
+                    _aad(fixed_header, final, total + n if final else None),
+                ))
+                total += n
+                index += 1
+                if final:
+                    break
+                current, lookahead, n = lookahead, current, next_n
+
+            dst.seek(0)
+            dst.write(HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, total))
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, out_path)
 
         logger.info(f"[ENCRYPT] Encrypted to {out_path}")
         return out_path
     except Exception as e:
         logger.error(f"[ENCRYPT] Failed to encrypt {in_path}: {e}")
         raise
+
+
+class ChunkedDecryptor:
+    """
+    Decrypts individual chunks of a chunked ``.enc`` file.
+
+    Opening checks the stored plaintext size against the file length and
+    decrypts the final chunk, so a file whose size field or tail was
+    tampered with raises before any range is served.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        header = self._file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a chunked encrypted file")
+        magic, self.version, self.chunk_size, self._prefix, self.plaintext_size = HEADER.unpack(header)
+        if magic != MAGIC or self.version not in _READABLE_VERSIONS or not self.chunk_size:
+            self._file.close()
+            raise ValueError(f"{path} is not a chunked encrypted file")
+        self._fixed_header = header[:_FIXED_HEADER_SIZE]
+        self.chunk_count = max(1, -(-self.plaintext_size // self.chunk_size))
+        _, self._cipher = _get_ciphers()
+
+        expected = HEADER.size + self.plaintext_size + self.chunk_count * TAG_SIZE
+        actual = os.fstat(self._file.fileno()).st_size
+        try:
+            if actual != expected:
+                raise ValueError(f"{path}: file is {actual} bytes, header implies {expected}")
+            # Authenticates the size (v2) and that the file ends where it should
+            self._final = self.read_chunk(self.chunk_count - 1)
+        except Exception:
+            self._file.close()
+            raise
+
+    def _chunk_length(self, index: int) -> int:
+        if index < self.chunk_count - 1:
+            return self.chunk_size
+        return self.plaintext_size - index * self.chunk_size
+
+    def read_chunk(self, index: int) -> bytes:
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(index)
+        final = index == self.chunk_count - 1
+        if final and getattr(self, "_final", None) is not None:
+            return self._final
+        self._file.seek(HEADER.size + index * (self.chunk_size + TAG_SIZE))
+        length = self._chunk_length(index) + TAG_SIZE
+        data = self._file.read(length)
+        if len(data) != length:
+            raise ValueError(f"{self.path}: chunk {index} is truncated")
+        size = self.plaintext_size if final and self.version >= 2 else None
+        return self._cipher.decrypt(_nonce(self._prefix, index), data, _aad(self._fixed_header, final, size))
+
+    def read_range(self, start: int, end: int) -> Iterator[bytes]:
+        """Plaintext bytes [start, end), decrypting only the chunks that cover them.
+
+        Chunks are fixed size, so chunk i sits at a computable offset and no
+        separate index is needed.
+        """
+        end = min(end, self.plaintext_size)
+        if start >= end:
+            return
+        first, last = start // self.chunk_size, (end - 1) // self.chunk_size
+        for index in range(first, last + 1):
+            chunk = self.read_chunk(index)
+            offset = index * self.chunk_size
+            yield chunk[max(0, start - offset):end - offset]
+
+    def __iter__(self) -> Iterator[bytes]:
+        for index in range(self.chunk_count):
+            yield self.read_chunk(index)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decrypt_bytes(in_path: str) -> bytes:
+    """Decrypt a whole ``.enc`` file into memory (needed for legacy Fernet files)."""
+    if is_chunked(in_path):
+        with ChunkedDecryptor(in_path) as dec:
+            return b"".join(dec)
+    fernet, _ = _get_ciphers()
+    with open(in_path, "rb") as f:
+        return fernet.decrypt(f.read())
+
+
+def decrypt_file(in_path: str, out_path: str) -> str:
+    """Decrypt a chunked or legacy Fernet ``.enc`` file to ``out_path``."""
+    try:
+        if is_chunked(in_path):
+            with ChunkedDecryptor(in_path) as dec, open(out_path, "wb") as dst:
+                for chunk in dec:
+                    dst.write(chunk)
+        else:
+            fernet, _ = _get_ciphers()
+            with open(in_path, "rb") as f:
+                data = fernet.decrypt(f.read())
+            with open(out_path, "wb") as f:
+                f.write(data)
+        logger.info(f"[ENCRYPT] Decrypted to {out_path}")
+        return out_path
+    except Exception as e:
+        logger.error(f"[ENCRYPT] Failed to decrypt {in_path}: {e}")
+        raise
@@ -1,9 +1,82 @@
 import cv2
+import numpy as np
 
 face_cascade = cv2.CascadeClassifier(
     cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
 )
 
-def detect_faces(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    return face_cascade.detectMultiScale(gray, 1.3, 5)
+# ROI mode: each region is searched at a scale where its longer side is at
+# most ROI_WORK_SIZE pixels, for faces between these fractions of its size.
+ROI_WORK_SIZE = 320
+ROI_PADDING = 0.15
+MIN_FACE_FRACTION = 0.08
+MAX_FACE_FRACTION = 0.9
+MIN_FACE_PIXELS = 20  # smallest face the default Haar cascade can find (24x24 window)
+
+_NO_FACES = np.empty((0, 4), dtype=np.int32)
+
+
+def _clamp_region(region, frame_w, frame_h):
+    x, y, w, h = (int(v) for v in region)
+    pad_w, pad_h = int(w * ROI_PADDING), int(h * ROI_PADDING)
+    x0, y0 = max(0, x - pad_w), max(0, y - pad_h)
+    x1, y1 = min(frame_w, x + w + pad_w), min(frame_h, y + h + pad_h)
+    return x0, y0, x1, y1
+
+
+def _merge_regions(boxes):
+    """Union overlapping (x0, y0, x1, y1) boxes so no area is searched twice."""
+    boxes = sorted(boxes)
+    merged = []
+    for box in boxes:
+        for i, other in enumerate(merged):
+            if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                merged[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                             max(box[2], other[2]), max(box[3], other[3]))
+                break
+        else:
+            merged.append(box)
+    if len(merged) < len(boxes):
+        # A union may now overlap a box it was compared with earlier
+        return _merge_regions(merged)
+    return merged
+
+
+def detect_faces(frame, regions=None, scale_factor=1.3, min_neighbors=5):
+    """
+    Face boxes (x, y, w, h) in full-frame coordinates.
+
+    Without ``regions`` the whole frame is searched at full resolution.
+    With ``regions`` (x, y, w, h boxes such as motion contours or person
+    detections) only those areas are searched, each downscaled to at most
+    ROI_WORK_SIZE pixels with face size limits derived from the region.
+    """
+    if regions is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return face_cascade.detectMultiScale(gray, scale_factor, min_neighbors)
+
+    frame_h, frame_w = frame.shape[:2]
+    boxes = [_clamp_region(r, frame_w, frame_h) for r in regions]
+    found = []
+    for x0, y0, x1, y1 in _merge_regions([b for b in boxes if b[2] > b[0] and b[3] > b[1]]):
+        w, h = x1 - x0, y1 - y0
+        scale = min(1.0, ROI_WORK_SIZE / max(w, h))
+        crop = frame[y0:y1, x0:x1]
+        if scale < 1.0:
+            crop = cv2.resize(crop, (max(1, int(w * scale)), max(1, int(h * scale))),
+                              interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+        short = min(gray.shape[:2])
+        min_size = max(MIN_FACE_PIXELS, int(short * MIN_FACE_FRACTION))
+        max_size = max(min_size, int(short * MAX_FACE_FRACTION))
+        if min_size > short:
+            continue
+        faces = face_cascade.detectMultiScale(
+            gray, scale_factor, min_neighbors,
+            minSize=(min_size, min_size), maxSize=(max_size, max_size),
+        )
+        for fx, fy, fw, fh in faces:
+            found.append((x0 + int(fx / scale), y0 + int(fy / scale), int(fw / scale), int(fh / scale)))
+
+    return np.array(found, dtype=np.int32) if found else _NO_FACES
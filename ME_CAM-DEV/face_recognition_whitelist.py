@@ -1,4 +1,9 @@
-from typing import List
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
 from utils.logger import get_logger
 
 logger = get_logger("face_whitelist")
@@ -9,37 +14,123 @@ except ImportError:
     face_recognition = None
     logger.warning("face_recognition library not available.")
 
+CACHE_NAME = ".encodings.npz"
+DEFAULT_TOLERANCE = 0.6  # same default as face_recognition.compare_faces
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(256 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class FaceWhitelist:
-    def __init__(self, known_images_dir: str = "faces/whitelist", enabled: bool = False):
+    """
+    Known faces from ``known_images_dir``, one identity per image (file stem).
+
+    Encodings are cached in ``.encodings.npz`` inside that directory, keyed
+    by the SHA-1 of each image, so only new or changed images are encoded
+    at startup. Matching compares all detected faces against all known
+    faces in one vectorized distance computation.
+    """
+
+    def __init__(self, known_images_dir: str = "faces/whitelist", enabled: bool = False,
+                 tolerance: float = DEFAULT_TOLERANCE):
         self.enabled = enabled and face_recognition is not None
-        self.known_encodings = []
+        self.tolerance = tolerance
+        self.known_names: List[str] = []
+        self.known_encodings = np.empty((0, 128), dtype=np.float64)
         if self.enabled:
             self._load_whitelist(known_images_dir)
 
+    def _load_cache(self, cache_path: str) -> Dict[str, np.ndarray]:
+        if not os.path.exists(cache_path):
+            return {}
+        try:
+            with np.load(cache_path) as data:
+                return dict(zip(data["hashes"].tolist(), data["encodings"]))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable encoding cache {cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, cache_path: str, cache: Dict[str, np.ndarray]):
+        tmp_path = cache_path + ".tmp"
+        hashes = list(cache)
+        encodings = np.array([cache[h] for h in hashes]).reshape(len(hashes), 128)
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes=np.array(hashes, dtype=str), encodings=encodings)
+        os.replace(tmp_path, cache_path)
+
     def _load_whitelist(self, dir_path: str):
-        import os
+        if not os.path.isdir(dir_path):
+            logger.warning(f"Whitelist directory {dir_path} not found.")
+            return
+
+        cache_path = os.path.join(dir_path, CACHE_NAME)
+        cached = self._load_cache(cache_path)
+        current: Dict[str, np.ndarray] = {}
+        names, encodings = [], []
+        encoded = 0
 
-        for fname in os.listdir(dir_path):
+        for fname in sorted(os.listdir(dir_path)):
             if not fname.lower().endswith((".jpg", ".jpeg", ".png")):
                 continue
             path = os.path.join(dir_path, fname)
-            img = face_recognition.load_image_file(path)
-            encs = face_recognition.face_encodings(img)
-            if encs:
-                self.known_encodings.append(encs[0])
-        logger.info(f"Loaded {len(self.known_encodings)} whitelisted faces.")
+            file_hash = _file_hash(path)
+            enc = cached.get(file_hash)
+            if enc is None:
+                img = face_recognition.load_image_file(path)
+                encs = face_recognition.face_encodings(img)
+                encoded += 1
+                # NaN marks "no face" so such images aren't re-encoded every start
+                enc = encs[0] if encs else np.full(128, np.nan)
+            current[file_hash] = enc
+            if np.isnan(enc[0]):
+                logger.warning(f"No face found in {fname}, skipping.")
+                continue
+            names.append(os.path.splitext(fname)[0])
+            encodings.append(enc)
 
-    def is_face_whitelisted(self, frame) -> bool:
+        if encoded or set(current) != set(cached):
+            try:
+                self._save_cache(cache_path, current)
+            except OSError as e:
+                logger.warning(f"Could not write encoding cache: {e}")
+
+        self.known_names = names
+        if encodings:
+            self.known_encodings = np.array(encodings)
+        logger.info(f"Loaded {len(names)} whitelisted faces ({encoded} newly encoded).")
+
+    def match(self, frame, face_locations: Optional[list] = None) -> Dict:
+        """
+        Match every face in a BGR frame against the whitelist.
+
+        Returns whitelisted, the best matching identity and its distance,
+        and how many faces were found. ``face_locations`` (top, right,
+        bottom, left boxes) skips face detection when already known.
+        """
         if not self.enabled:
-            return True
-
-        rgb = frame[:, :, ::-1]
-        encs = face_recognition.face_encodings(rgb)
-        if not encs:
-            return False
-        for enc in encs:
-            matches = face_recognition.compare_faces(self.known_encodings, enc)
-            if any(matches):
-                return True
-        return False
+            return {"whitelisted": True, "identity": None, "distance": None, "faces": 0}
+
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        encs = face_recognition.face_encodings(rgb, known_face_locations=face_locations)
+        result = {"whitelisted": False, "identity": None, "distance": None, "faces": len(encs)}
+        if not encs or not len(self.known_encodings):
+            return result
+
+        # (faces, known) Euclidean distances in one go
+        diffs = np.asarray(encs)[:, None, :] - self.known_encodings[None, :, :]
+        distances = np.sqrt(np.einsum("fkd,fkd->fk", diffs, diffs))
+        face_i, known_i = np.unravel_index(np.argmin(distances), distances.shape)
+        best = float(distances[face_i, known_i])
+        result["distance"] = round(best, 4)
+        if best <= self.tolerance:
+            result["whitelisted"] = True
+            result["identity"] = self.known_names[known_i]
+        return result
+
+    def is_face_whitelisted(self, frame) -> bool:
+        return self.match(frame)["whitelisted"]
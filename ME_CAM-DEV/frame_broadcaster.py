@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Callable, Generator, List, Optional, Tuple
+
+
+class FrameBroadcaster:
+    """
+    Publishes frames tagged with a monotonically increasing sequence number.
+
+    Consumers remember the last sequence they saw and block until a newer
+    frame is published. Only the newest frame is kept, so a slow consumer
+    simply skips ahead instead of building up a queue.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._seq = 0
+        self._frame: Optional[bytes] = None
+        self._timestamp = 0.0
+        self._listeners: List[Callable[[bytes, float], None]] = []
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def add_listener(self, callback: Callable[[bytes, float], None]):
+        """
+        Register callback(frame, timestamp) run synchronously for every
+        published frame. Listeners must be cheap (e.g. a deque append).
+        """
+        self._listeners.append(callback)
+
+    def publish(self, frame: bytes):
+        with self._cond:
+            self._seq += 1
+            self._frame = frame
+            self._timestamp = timestamp = time.time()
+            self._cond.notify_all()
+        for callback in self._listeners:
+            callback(frame, timestamp)
+
+    def latest(self) -> Tuple[int, Optional[bytes]]:
+        with self._cond:
+            return self._seq, self._frame
+
+    def wait_for_frame(self, last_seq: int = 0, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        """
+        Block until a frame newer than ``last_seq`` exists.
+
+        Returns ``(seq, frame)`` for the newest frame, or ``(last_seq, None)``
+        if the timeout expired first.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq and self._frame is not None, timeout):
+                return last_seq, None
+            return self._seq, self._frame
+
+    def frames(self, timeout: float = 1.0) -> Generator[bytes, None, None]:
+        """
+        Yield each new frame once; idle waits use no CPU.
+
+        Yields b"" after every ``timeout`` without a frame, so consumers get
+        a chance to notice they should stop; skip empty frames.
+        """
+        last_seq = 0
+        while True:
+            seq, frame = self.wait_for_frame(last_seq, timeout)
+            if frame is None:
+                yield b""
+                continue
+            last_seq = seq
+            yield frame
@@ -1,13 +1,378 @@
-from flask import Flask, render_template
+import asyncio
+import hmac
+import ipaddress
 import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, jsonify, redirect, render_template, request, session, url_for
+from loguru import logger
+
+from hub_mosaic import DEFAULT_MOSAIC, MosaicStream
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HUB_CONFIG_PATH = os.path.join(BASE_DIR, "hub_config.json")
+
+POLL_INTERVAL = 5.0      # seconds between fleet polls
+STATUS_TTL = 15.0        # older results are reported as stale / offline
+CAMERA_TIMEOUT = 3.0     # per camera, for all of its requests together
+MAX_CONCURRENT_POLLS = 32
+POLL_ENDPOINTS = ("/api/status", "/api/events", "/api/storage", "/api/battery")
+
+DEFAULT_BIND = "127.0.0.1"
+LEGACY_BIND = "0.0.0.0"  # kept for plain-list hub_config.json files written before "bind" existed
+DEFAULT_PORT = 8090
+
+app = Flask(__name__, template_folder="web/templates")
+app.secret_key = os.urandom(24)
+
+
+class HubConfig:
+    """
+    hub_config.json, re-read only when the file changes.
+
+    Either a plain list of cameras, or an object with a "devices" list and
+    optional "mosaic" settings (width, height, fps, quality), "access_key"
+    (required from clients that aren't on localhost), "bind" and "port".
+    A plain list keeps listening on all interfaces, as the hub used to.
+    """
+
+    def __init__(self, path: str = HUB_CONFIG_PATH):
+        self.path = path
+        self._stamp = None
+        self._devices: List[Dict] = []
+        self._mosaic: Dict = dict(DEFAULT_MOSAIC)
+        self._server: Dict = {"access_key": "", "bind": DEFAULT_BIND, "port": DEFAULT_PORT, "legacy": False}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                legacy = isinstance(data, list)
+                if legacy:
+                    data = {"devices": data}
+                self._devices = data.get("devices", [])
+                self._mosaic = {**DEFAULT_MOSAIC, **data.get("mosaic", {})}
+                self._server = {
+                    "access_key": data.get("access_key", ""),
+                    "bind": data.get("bind", LEGACY_BIND if legacy else DEFAULT_BIND),
+                    "port": int(data.get("port", DEFAULT_PORT)),
+                    "legacy": legacy,
+                }
+                logger.info(f"[HUB] Loaded {len(self._devices)} cameras from {self.path}")
+            except Exception as e:
+                logger.error(f"[HUB] Failed to load {self.path}: {e}")
+            self._stamp = stamp
+
+    def devices(self) -> List[Dict]:
+        self._refresh()
+        return self._devices
+
+    def mosaic_settings(self) -> Dict:
+        self._refresh()
+        return self._mosaic
+
+    def server_settings(self) -> Dict:
+        self._refresh()
+        return self._server
+
+
+class CameraConnection:
+    """
+    One persistent HTTP/1.1 connection to a camera.
+
+    Requests are serialized on the connection and revalidated with the
+    ETag of the previous response, so an idle camera answers 304 with no
+    body. A connection the camera closed while idle is reopened once.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.api_key = api_key
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+        self._cache: Dict[str, Tuple[str, object]] = {}  # path -> (etag, data)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _request(self, path: str) -> Tuple[int, Dict[str, str], bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Accept: application/json"]
+        if self.api_key:
+            lines.append(f"X-API-Key: {self.api_key}")
+        if path in self._cache:
+            lines.append(f"If-None-Match: {self._cache[path][0]}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by camera")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            body = await self._reader.readexactly(int(headers["content-length"]))
+        elif status in (204, 304):
+            body = b""
+        else:
+            body = await self._reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, body
+
+    async def get_json(self, path: str):
+        async with self._lock:
+            reused = self._writer is not None
+            try:
+                status, headers, body = await self._request(path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused:
+                    raise
+                status, headers, body = await self._request(path)
+
+            if status == 304 and path in self._cache:
+                return self._cache[path][1]
+            if status != 200:
+                raise ValueError(f"HTTP {status}")
+            data = json.loads(body)
+            if "etag" in headers:
+                self._cache[path] = (headers["etag"], data)
+            return data
+
+
+class FleetPoller:
+    """
+    Polls every camera concurrently from one asyncio loop in a background thread.
+
+    Pages read the last results from snapshot() and never wait on a camera;
+    results older than ``ttl`` are marked stale.
+    """
+
+    def __init__(self, config: HubConfig, interval: float = POLL_INTERVAL, ttl: float = STATUS_TTL,
+                 timeout: float = CAMERA_TIMEOUT):
+        self.config = config
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self._connections: Dict[str, CameraConnection] = {}
+        self._results: Dict[str, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True,
+                                        name="hub-poller")
+        self._thread.start()
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_all(semaphore)
+            except Exception as e:
+                logger.error(f"[HUB] Poll failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def poll_all(self, semaphore: asyncio.Semaphore):
+        devices = self.config.devices()
+        urls = {d["url"] for d in devices}
+        for url in list(self._connections):
+            if url not in urls:
+                self._connections.pop(url).close()
+                self._results.pop(url, None)
+        await asyncio.gather(*(self._poll_camera(d, semaphore) for d in devices))
+
+    async def _poll_camera(self, device: Dict, semaphore: asyncio.Semaphore):
+        url = device["url"]
+        conn = self._connections.get(url)
+        if conn is None or conn.api_key != device.get("api_key"):
+            if conn is not None:
+                conn.close()
+            conn = self._connections[url] = CameraConnection(url, device.get("api_key"))
+
+        result = {"online": False, "error": None}
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._fetch_all(conn, result), self.timeout)
+            except asyncio.TimeoutError:
+                conn.close()  # a half-read response leaves the connection unusable
+                result["error"] = f"timed out after {self.timeout:.0f}s"
+            except Exception as e:
+                conn.close()
+                result["error"] = str(e) or type(e).__name__
+            result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        result["updated"] = time.time()
+        # Replaced wholesale, so readers never see a half-updated entry
+        self._results[url] = result
+
+    async def _fetch_all(self, conn: CameraConnection, result: Dict):
+        for path in POLL_ENDPOINTS:
+            key = path.rsplit("/", 1)[-1]
+            try:
+                result[key] = await conn.get_json(path)
+            except ValueError as e:
+                # e.g. 401 when the hub has no API key for this camera
+                result[key] = None
+                result.setdefault("warnings", []).append(f"{path}: {e}")
+                continue
+            if key == "status":
+                result["online"] = True
+
+    def snapshot(self) -> List[Dict]:
+        now = time.time()
+        fleet = []
+        for device in self.config.devices():
+            result = dict(self._results.get(device["url"]) or {"online": False, "error": "not polled yet"})
+            result["stale"] = "updated" not in result or now - result["updated"] > self.ttl
+            if result["stale"]:
+                result["online"] = False
+            fleet.append({"name": device.get("name", device["url"]), "url": device["url"], **result})
+        return fleet
+
+
+hub_config = HubConfig()
+poller = FleetPoller(hub_config)
+_mosaic: Optional[MosaicStream] = None
+_mosaic_settings: Optional[Dict] = None
+_mosaic_lock = threading.Lock()
+
+
+def get_mosaic() -> MosaicStream:
+    """The shared mosaic, rebuilt when its settings in hub_config.json change."""
+    global _mosaic, _mosaic_settings
+    settings = hub_config.mosaic_settings()
+    with _mosaic_lock:
+        if _mosaic is None or settings != _mosaic_settings:
+            if _mosaic is not None:
+                _mosaic.stop()
+            _mosaic = MosaicStream(hub_config.devices, **settings)
+            _mosaic_settings = settings
+        return _mosaic
+
+
+def mosaic_generator():
+    for frame in get_mosaic().frames():
+        yield (
+            b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n\r\n" +
+            frame +
+            b"\r\n"
+        )
+
+
+def _is_loopback(addr: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def access_key_valid(key: Optional[str]) -> bool:
+    expected = hub_config.server_settings()["access_key"]
+    return bool(expected and key) and hmac.compare_digest(str(key), str(expected))
+
+
+@app.before_request
+def require_hub_auth():
+    """
+    Every page proxies data fetched with the cameras' API keys, so all of
+    them need a hub session or X-API-Key. Without an access_key configured
+    only localhost clients are served.
+    """
+    if request.endpoint in ("login", "static"):
+        return None
+    if session.get("hub_authenticated") or access_key_valid(request.headers.get("X-API-Key")):
+        return None
+    if not hub_config.server_settings()["access_key"] and _is_loopback(request.remote_addr):
+        return None
+    if request.path.startswith("/api/") or request.path.endswith(".mjpg"):
+        return jsonify({"error": "unauthorized"}), 401
+    return redirect(url_for("login"))
+
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    error = None
+    if request.method == "POST":
+        if access_key_valid(request.form.get("access_key", "")):
+            session["hub_authenticated"] = True
+            logger.info(f"[HUB] Login from {request.remote_addr}")
+            return redirect(url_for("index"))
+        error = "Invalid access key"
+        if not hub_config.server_settings()["access_key"]:
+            error = "No access_key is set in hub_config.json; remote access is disabled"
+    return render_template("hub_login.html", error=error)
+
+
+@app.route("/logout")
+def logout():
+    session.clear()
+    return redirect(url_for("login"))
 
-app = Flask(__name__)
 
 @app.route("/")
 def index():
-    with open("hub_config.json") as f:
-        devices = json.load(f)
-    return render_template("multicam.html", devices=devices)
+    poller.start()
+    return render_template("multicam.html", devices=poller.snapshot())
+
+
+@app.route("/api/fleet")
+def api_fleet():
+    poller.start()
+    return jsonify(poller.snapshot())
+
+
+@app.route("/mosaic.mjpg")
+def mosaic_mjpg():
+    return Response(mosaic_generator(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/api/mosaic")
+def api_mosaic():
+    return jsonify(get_mosaic().stats())
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8090)
+    server = hub_config.server_settings()
+    if server["legacy"]:
+        logger.warning(f"[HUB] {HUB_CONFIG_PATH} is a plain camera list: still listening on "
+                       f"{server['bind']}. Convert it to {{\"devices\": [...], \"access_key\": ...}} "
+                       "to choose the bind address and let LAN clients log in")
+    if not _is_loopback(server["bind"]) and not server["access_key"]:
+        logger.warning(f"[HUB] Listening on {server['bind']} without an access_key: "
+                       "only localhost clients will be served")
+    poller.start()
+    app.run(host=server["bind"], port=server["port"], threaded=True)
@@ -0,0 +1,306 @@
+import math
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, Generator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_broadcaster import FrameBroadcaster
+from mjpeg_splitter import MJPEGFrameSplitter
+from utils.logger import get_logger
+
+logger = get_logger("hub_mosaic")
+
+DEFAULT_MOSAIC = {"width": 1280, "height": 720, "fps": 5, "quality": 70}
+UPSTREAM_TIMEOUT = 10.0   # socket timeout for the upstream MJPEG connections
+OFFLINE_AFTER = 5.0       # seconds without a frame before a tile is shown as offline
+MAX_BACKOFF = 30.0
+
+_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class UpstreamFeed:
+    """
+    Keeps the newest JPEG from one camera's /stream.mjpg.
+
+    Frames are only split out of the stream here, never decoded; the
+    compositor decodes a frame when it actually draws it. The camera is
+    asked for a variant close to the tile size, so the upstream already
+    carries no more pixels than the mosaic needs. Reconnects with backoff.
+    """
+
+    def __init__(self, device: Dict, tile_width: int, fps: int):
+        self.name = device.get("name", device["url"])
+        self.url = f"{device['url'].rstrip('/')}/stream.mjpg?w={tile_width}&fps={fps}"
+        self.api_key = device.get("api_key")
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._frame: Optional[bytes] = None
+        self._last_frame_at = 0.0
+        self._stop = threading.Event()
+        self._response = None
+        self.reconnects = 0
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name=f"mosaic-{self.name}").start()
+
+    def stop(self):
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()  # unblocks a pending read
+            except Exception:
+                pass
+
+    def latest(self) -> Tuple[int, Optional[bytes]]:
+        with self._lock:
+            return self._seq, self._frame
+
+    @property
+    def online(self) -> bool:
+        return time.monotonic() - self._last_frame_at < OFFLINE_AFTER
+
+    def _read_stream(self):
+        request = urllib.request.Request(self.url)
+        if self.api_key:
+            request.add_header("X-API-Key", self.api_key)
+        with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+            self._response = response
+            splitter = MJPEGFrameSplitter(capacity=1024 * 1024, chunk_size=64 * 1024)
+            for frame in splitter.iter_stream(response):
+                with self._lock:
+                    self._seq += 1
+                    self._frame = frame
+                    self._last_frame_at = time.monotonic()
+                if self._stop.is_set():
+                    return
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._read_stream()
+                backoff = 1.0
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"[MOSAIC] {self.name}: upstream failed ({e}), retrying in {backoff:.0f}s")
+            finally:
+                self._response = None
+            if self._stop.wait(backoff):
+                break
+            self.reconnects += 1
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def _grid(count: int, width: int, height: int) -> List[Tuple[int, int, int, int]]:
+    """(x, y, w, h) tile rectangles for ``count`` cameras, filled row by row."""
+    if count == 0:
+        return []
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    tile_w, tile_h = width // cols, height // rows
+    return [((i % cols) * tile_w, (i // cols) * tile_h, tile_w, tile_h) for i in range(count)]
+
+
+class MosaicStream:
+    """
+    One MJPEG grid composited from the latest frame of every camera.
+
+    A single compositor thread runs at the configured rate while at least
+    one viewer is connected. Each tick only tiles whose camera delivered
+    a new frame are decoded (at reduced scale via IMREAD_REDUCED_*) and
+    redrawn into a preallocated canvas; the canvas is re-encoded only if
+    some tile changed. Viewers share the output through a FrameBroadcaster.
+    """
+
+    def __init__(self, devices: Callable[[], List[Dict]], width: int = DEFAULT_MOSAIC["width"],
+                 height: int = DEFAULT_MOSAIC["height"], fps: int = DEFAULT_MOSAIC["fps"],
+                 quality: int = DEFAULT_MOSAIC["quality"]):
+        self.devices = devices
+        self.width = width & ~1
+        self.height = height & ~1
+        self.fps = max(1, fps)
+        self.quality = quality
+        self.broadcaster = FrameBroadcaster()
+
+        self._lock = threading.Lock()
+        self._subscribers = 0
+        self._generation = 0
+        self._closed = False
+        self._tiles: List[Dict] = []  # the current generation's, for stats()
+        self._stats = {"frames_encoded": 0, "tiles_drawn": 0, "ticks": 0}
+
+    # -- tiles ---------------------------------------------------------------
+
+    def _sync_tiles(self, canvas: np.ndarray, layout: Dict):
+        """Rebuild ``layout`` (this compositor generation's tiles) if the device list changed."""
+        devices = self.devices()
+        key = tuple((d["url"], d.get("name"), d.get("api_key")) for d in devices)
+        if key == layout["key"]:
+            return
+        self._stop_feeds(layout["tiles"])
+        canvas[:] = 0
+        tiles = []
+        for device, rect in zip(devices, _grid(len(devices), self.width, self.height)):
+            feed = UpstreamFeed(device, rect[2], self.fps)
+            feed.start()
+            tiles.append({"feed": feed, "rect": rect, "seq": 0, "offline": None, "source_size": None})
+        layout["key"] = key
+        layout["tiles"] = tiles
+        logger.info(f"[MOSAIC] Layout: {len(tiles)} cameras in {self.width}x{self.height}")
+
+    @staticmethod
+    def _stop_feeds(tiles: List[Dict]):
+        for tile in tiles:
+            tile["feed"].stop()
+
+    @staticmethod
+    def _reduction(source_size: Optional[Tuple[int, int]], tile_w: int, tile_h: int) -> int:
+        """Largest JPEG decode reduction (1, 2, 4 or 8) that still covers the tile."""
+        if source_size is None:
+            return 1
+        factor = min(source_size[0] / tile_w, source_size[1] / tile_h)
+        for reduction in (8, 4, 2):
+            if factor >= reduction:
+                return reduction
+        return 1
+
+    def _label(self, view: np.ndarray, text: str, color=(255, 255, 255)):
+        h = view.shape[0]
+        cv2.putText(view, text, (6, h - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+        cv2.putText(view, text, (6, h - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+
+    def _draw_tile(self, canvas: np.ndarray, tile: Dict, jpeg: bytes) -> bool:
+        x, y, w, h = tile["rect"]
+        reduction = self._reduction(tile["source_size"], w, h)
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), _DECODE_FLAGS[reduction])
+        if img is None:
+            return False
+        tile["source_size"] = (img.shape[1] * reduction, img.shape[0] * reduction)
+
+        # Fit inside the tile, keeping the aspect ratio
+        scale = min(w / img.shape[1], h / img.shape[0])
+        fit_w, fit_h = max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale))
+        view = canvas[y:y + h, x:x + w]
+        off_x, off_y = (w - fit_w) // 2, (h - fit_h) // 2
+        if (fit_w, fit_h) != (w, h):
+            view[:] = 0
+        cv2.resize(img, (fit_w, fit_h), dst=view[off_y:off_y + fit_h, off_x:off_x + fit_w],
+                   interpolation=cv2.INTER_AREA)
+        self._label(view, tile["feed"].name)
+        return True
+
+    def _draw_offline(self, canvas: np.ndarray, tile: Dict):
+        x, y, w, h = tile["rect"]
+        view = canvas[y:y + h, x:x + w]
+        if tile["seq"] == 0:
+            view[:] = 40
+        else:
+            # Keep the last picture, dimmed
+            np.right_shift(view, 2, out=view)
+        self._label(view, f"{tile['feed'].name} (offline)", (80, 80, 255))
+
+    def _compose(self, canvas: np.ndarray, tiles: List[Dict]) -> bool:
+        changed = False
+        for tile in tiles:
+            feed = tile["feed"]
+            seq, jpeg = feed.latest()
+            if seq != tile["seq"] and jpeg is not None:
+                try:
+                    drawn = self._draw_tile(canvas, tile, jpeg)
+                except Exception as e:
+                    logger.warning(f"[MOSAIC] {feed.name}: bad frame: {e}")
+                    drawn = False
+                tile["seq"] = seq
+                if drawn:
+                    tile["offline"] = False
+                    self._stats["tiles_drawn"] += 1
+                    changed = True
+            elif tile["offline"] is not True and not feed.online:
+                self._draw_offline(canvas, tile)
+                tile["offline"] = True
+                changed = True
+        return changed
+
+    # -- compositor ----------------------------------------------------------
+
+    def _run(self, generation: int):
+        canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        # Tiles and feeds belong to this generation only: after a quick
+        # release/acquire the next generation builds its own while this one exits
+        layout = {"key": None, "tiles": []}
+        interval = 1.0 / self.fps
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        next_tick = time.monotonic()
+        try:
+            while self._generation == generation:
+                self._sync_tiles(canvas, layout)
+                if self._generation == generation:
+                    self._tiles = layout["tiles"]
+                self._stats["ticks"] += 1
+                if self._compose(canvas, layout["tiles"]):
+                    ok, buf = cv2.imencode(".jpg", canvas, params)
+                    if ok:
+                        self._stats["frames_encoded"] += 1
+                        self.broadcaster.publish(buf.tobytes())
+                next_tick += interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_tick = time.monotonic()
+        finally:
+            self._stop_feeds(layout["tiles"])
+            if self._tiles is layout["tiles"]:
+                self._tiles = []
+
+    def _acquire(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._subscribers == 1 and not self._closed:
+                self._generation += 1
+                threading.Thread(target=self._run, args=(self._generation,), daemon=True,
+                                 name="mosaic").start()
+                logger.info(f"[MOSAIC] Started {self.width}x{self.height} @ {self.fps} fps q{self.quality}")
+
+    def _release(self):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._closed:
+                # Bumping the generation stops the compositor and its feeds
+                self._generation += 1
+                logger.info("[MOSAIC] Stopped (no viewers)")
+
+    def frames(self) -> Generator[bytes, None, None]:
+        """Yield each new mosaic frame; ends when the mosaic is stopped."""
+        self._acquire()
+        try:
+            last_seq = 0
+            while not self._closed:
+                seq, frame = self.broadcaster.wait_for_frame(last_seq, timeout=1.0)
+                if frame is not None:
+                    last_seq = seq
+                    yield frame
+        finally:
+            self._release()
+
+    def stop(self):
+        """Stop compositing and end every viewer's stream (e.g. on a settings change)."""
+        with self._lock:
+            self._closed = True
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["viewers"] = self._subscribers
+        stats["cameras"] = [{"name": t["feed"].name, "online": t["feed"].online,
+                             "reconnects": t["feed"].reconnects} for t in list(self._tiles)]
+        return stats
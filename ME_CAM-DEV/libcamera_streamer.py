@@ -3,6 +3,9 @@ import threading
 import time
 from typing import Generator, Optional
 
+from frame_broadcaster import FrameBroadcaster
+from mjpeg_splitter import MJPEGFrameSplitter
+
 class LibcameraMJPEGStreamer:
     """
     Wraps libcamera-vid to provide an MJPEG frame generator.
@@ -20,8 +23,7 @@ class LibcameraMJPEGStreamer:
 
         self._process: Optional[subprocess.Popen] = None
         self._thread: Optional[threading.Thread] = None
-        self._buffer = bytearray()
-        self._lock = threading.Lock()
+        self.broadcaster = FrameBroadcaster()
         self._running = False
 
     def _build_command(self):
@@ -38,41 +40,24 @@ class LibcameraMJPEGStreamer:
 
     def _reader_loop(self):
         """
-        Reads from libcamera-vid stdout, accumulates MJPEG frames.
+        Reads from libcamera-vid stdout, splitting out complete MJPEG frames.
         """
         if not self._process or not self._process.stdout:
             return
 
-        SOI = b"\xff\xd8"  # Start Of Image
-        EOI = b"\xff\xd9"  # End Of Image
+        splitter = MJPEGFrameSplitter()
+        stdout = self._process.stdout
 
         while self._running:
-            chunk = self._process.stdout.read(1024)
-            if not chunk:
+            if not splitter.readinto_from(stdout):
                 break
 
-            with self._lock:
-                self._buffer.extend(chunk)
-                # Try to extract complete JPEGs
-                while True:
-                    start = self._buffer.find(SOI)
-                    if start == -1:
-                        # no start marker yet
-                        self._buffer.clear()
-                        break
-                    end = self._buffer.find(EOI, start + 2)
-                    if end == -1:
-                        # no end marker yet, keep data
-                        if start > 0:
-                            # discard leading garbage
-                            del self._buffer[:start]
-                        break
-                    # We found a full JPEG
-                    frame = self._buffer[start:end+2]
-                    # Remove this frame from buffer
-                    del self._buffer[:end+2]
-                    # Store latest frame in a dedicated attribute
-                    self._latest_frame = frame
+            frame = None
+            for frame in splitter.frames():
+                pass
+            if frame is not None:
+                # Only the newest complete frame is worth publishing
+                self.broadcaster.publish(frame)
 
         # Clean up if process exits
         self.stop()
@@ -92,7 +77,6 @@ class LibcameraMJPEGStreamer:
             stderr=subprocess.DEVNULL,
             bufsize=0
         )
-        self._latest_frame: Optional[bytes] = None
         self._thread = threading.Thread(target=self._reader_loop, daemon=True)
         self._thread.start()
 
@@ -130,13 +114,8 @@ class LibcameraMJPEGStreamer:
 
     def frames(self) -> Generator[bytes, None, None]:
         """
-        Generator that yields the latest MJPEG frame.
-        If no frame is yet available, it waits briefly.
+        Generator that yields each new MJPEG frame exactly once.
+        Blocks until the next frame arrives; slow consumers skip to the newest.
         """
         self.start()
-        while True:
-            frame = getattr(self, "_latest_frame", None)
-            if frame:
-                yield frame
-            else:
-                time.sleep(0.05)
+        yield from self.broadcaster.frames()
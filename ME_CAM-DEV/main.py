@@ -1,9 +1,19 @@
 from loguru import logger
-from web.app import app
+from config_manager import get_config
 import os
 
 os.makedirs("logs", exist_ok=True)
 
 if __name__ == "__main__":
+    # Imported here, not at module level: encryption worker processes re-run
+    # this module as __mp_main__ and must not start a second camera pipeline
+    from web.app import app, pipeline, api_key_valid
+
     logger.add("logs/mecam.log", rotation="10 MB", retention="14 days", backtrace=True, diagnose=True)
-    app.run(host="0.0.0.0", port=8080, debug=False)
+    if get_config().get("server_mode", "async") == "async":
+        # MJPEG viewers share one event loop instead of holding a thread each
+        from web.async_server import AsyncAppServer
+        AsyncAppServer(app, pipeline.mjpeg_frames, host="0.0.0.0", port=8080,
+                       api_key_valid=api_key_valid).run()
+    else:
+        app.run(host="0.0.0.0", port=8080, debug=False, threaded=True)
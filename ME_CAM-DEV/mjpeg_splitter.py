@@ -0,0 +1,150 @@
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+from utils.logger import get_logger
+
+logger = get_logger("mjpeg_splitter")
+
+SOI = b"\xff\xd8"  # Start Of Image
+EOI = b"\xff\xd9"  # End Of Image
+
+
+class MJPEGFrameSplitter:
+    """
+    Incremental MJPEG frame splitter.
+
+    Bytes are read with ``readinto`` straight into a preallocated buffer.
+    The splitter remembers where the last marker scan stopped so every byte
+    is inspected only once, and consumed data is only moved when the free
+    tail of the buffer gets too small for another read.
+
+    Frames are handed out either as immutable ``bytes`` (a single copy out of
+    the buffer) or, with ``copy=False``, as ``memoryview`` slices that stay
+    valid only until the next read into the splitter.
+    """
+
+    def __init__(self, capacity: int = 2 * 1024 * 1024, chunk_size: int = 64 * 1024):
+        if capacity < 2 * chunk_size:
+            raise ValueError("capacity must be at least twice the chunk size")
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0         # first unconsumed byte
+        self._end = 0           # one past the last valid byte
+        self._scan = 0          # where the next marker search resumes
+        self._frame_start = -1  # offset of the SOI of the frame being assembled
+
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.dropped_bytes = 0
+
+    def _compact(self):
+        """Move unconsumed bytes to the front of the buffer."""
+        if self._start == 0:
+            return
+        pending = self._end - self._start
+        if pending:
+            self._buf[0:pending] = self._view[self._start:self._end]
+        shift = self._start
+        self._start = 0
+        self._end = pending
+        self._scan -= shift
+        if self._frame_start >= 0:
+            self._frame_start -= shift
+
+    def _reserve(self):
+        """Make sure at least ``chunk_size`` bytes are free at the tail."""
+        if self.capacity - self._end >= self.chunk_size:
+            return
+        self._compact()
+        if self.capacity - self._end >= self.chunk_size:
+            return
+        # A single frame is larger than the buffer: drop it and resync.
+        logger.warning("[MJPEG] Frame exceeds splitter capacity, dropping partial data")
+        self.dropped_bytes += self._end - self._start
+        self._start = self._end = self._scan = 0
+        self._frame_start = -1
+
+    def readinto_from(self, stream: BinaryIO) -> int:
+        """
+        Read one chunk from ``stream`` into the buffer.
+
+        Returns the number of bytes read; 0 means end of stream.
+        """
+        self._reserve()
+        n = stream.readinto(self._view[self._end:self._end + self.chunk_size])
+        if not n:
+            return 0
+        self._end += n
+        self.bytes_in += n
+        return n
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[bytes]:
+        """
+        Append already-read bytes (non-file sources) and return every frame
+        they complete, as ``bytes``.
+
+        Frames have to be taken out whenever the buffer must make room, so
+        this returns them all rather than leaving some for frames().
+        """
+        data = memoryview(data)
+        out: List[bytes] = []
+        while len(data):
+            if self.capacity - self._end < self.chunk_size:
+                # Make room by consuming what is complete so far
+                out.extend(self.frames())
+            self._reserve()
+            n = min(len(data), self.capacity - self._end)
+            self._view[self._end:self._end + n] = data[:n]
+            self._end += n
+            self.bytes_in += n
+            data = data[n:]
+        out.extend(self.frames())
+        return out
+
+    def _next_frame(self, copy: bool) -> Optional[Union[bytes, memoryview]]:
+        buf = self._buf
+        end = self._end
+
+        if self._frame_start < 0:
+            soi = buf.find(SOI, max(self._scan - 1, self._start), end)
+            if soi == -1:
+                # Nothing but garbage; keep the last byte in case it is 0xFF.
+                if end - self._start > 1:
+                    self.dropped_bytes += end - 1 - self._start
+                    self._start = end - 1
+                self._scan = end
+                return None
+            self.dropped_bytes += soi - self._start
+            self._start = soi
+            self._frame_start = soi
+            self._scan = soi + 2
+
+        eoi = buf.find(EOI, max(self._scan - 1, self._frame_start + 2), end)
+        if eoi == -1:
+            self._scan = end
+            return None
+
+        frame_end = eoi + 2
+        if copy:
+            frame = bytes(self._view[self._frame_start:frame_end])
+        else:
+            frame = self._view[self._frame_start:frame_end]
+        self._start = self._scan = frame_end
+        self._frame_start = -1
+        self.frames_out += 1
+        return frame
+
+    def frames(self, copy: bool = True) -> Iterator[Union[bytes, memoryview]]:
+        """Yield every complete frame currently held in the buffer."""
+        while True:
+            frame = self._next_frame(copy)
+            if frame is None:
+                return
+            yield frame
+
+    def iter_stream(self, stream: BinaryIO, copy: bool = True) -> Iterator[Union[bytes, memoryview]]:
+        """Read ``stream`` until EOF, yielding frames as they complete."""
+        while self.readinto_from(stream):
+            yield from self.frames(copy)
@@ -1,18 +1,62 @@
+from typing import List, Optional, Sequence
+
 import cv2
 import numpy as np
 from utils.logger import get_logger
 
 logger = get_logger("motion_detector")
 
+MODES = ("frame_diff", "running_average")
+
 
 class MotionDetector:
-    def __init__(self, sensitivity: float = 0.5, min_area: int = 500):
+    """
+    Frame-difference motion detector.
+
+    Modes:
+      frame_diff       -- original full-resolution diff against the previous frame
+      running_average  -- downscaled to ``work_width``, diffed against an
+                          exponentially weighted background, optionally masked
+                          by ROI polygons, with an early exit on the changed
+                          pixel count before any contour extraction
+
+    ``roi`` is a list of polygons in normalized (0..1) frame coordinates,
+    e.g. ``[[[0, 0.5], [1, 0.5], [1, 1], [0, 1]]]`` for the bottom half.
+    """
+
+    def __init__(self, sensitivity: float = 0.5, min_area: int = 500, mode: str = "frame_diff",
+                 work_width: int = 320, alpha: float = 0.05,
+                 roi: Optional[List[Sequence[Sequence[float]]]] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown motion mode: {mode}")
         self.sensitivity = sensitivity
         self.min_area = min_area
+        self.mode = mode
+        self.work_width = work_width
+        self.alpha = alpha
+        self.roi = roi or []
         self.prev_gray = None
 
+        self.last_changed_pixels = 0
+        self._background = None
+        self._background_u8 = None
+        self._delta = None
+        self._thresh = None
+        self._mask = None
+
     def detect(self, frame) -> bool:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return self.detect_gray(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    def detect_gray(self, gray) -> bool:
+        """Same as detect() for frames already decoded to grayscale."""
+        if self.mode == "running_average":
+            return self._detect_running_average(gray)
+        return self._detect_frame_diff(gray)
+
+    def _threshold_value(self) -> int:
+        return int(30 * (1.0 - self.sensitivity) + 5)
+
+    def _detect_frame_diff(self, gray) -> bool:
         gray = cv2.GaussianBlur(gray, (21, 21), 0)
 
         if self.prev_gray is None:
@@ -20,8 +64,7 @@ class MotionDetector:
             return False
 
         frame_delta = cv2.absdiff(self.prev_gray, gray)
-        thresh_value = int(30 * (1.0 - self.sensitivity) + 5)
-        _, thresh = cv2.threshold(frame_delta, thresh_value, 255, cv2.THRESH_BINARY)
+        _, thresh = cv2.threshold(frame_delta, self._threshold_value(), 255, cv2.THRESH_BINARY)
         thresh = cv2.dilate(thresh, None, iterations=2)
 
         contours, _ = cv2.findContours(
@@ -35,3 +78,54 @@ class MotionDetector:
                 logger.info("Motion detected.")
                 return True
         return False
+
+    def _build_mask(self, width: int, height: int):
+        if not self.roi:
+            return None
+        mask = np.zeros((height, width), dtype=np.uint8)
+        scale = np.array([width - 1, height - 1], dtype=np.float32)
+        polygons = [np.round(np.asarray(p, dtype=np.float32) * scale).astype(np.int32) for p in self.roi]
+        cv2.fillPoly(mask, polygons, 255)
+        return mask
+
+    def _reset_background(self, gray):
+        h, w = gray.shape[:2]
+        self._background = gray.astype(np.float32)
+        self._background_u8 = gray.copy()
+        self._delta = np.empty_like(gray)
+        self._thresh = np.empty_like(gray)
+        self._mask = self._build_mask(w, h)
+
+    def _detect_running_average(self, gray) -> bool:
+        h, w = gray.shape[:2]
+        area_scale = 1.0
+        if w > self.work_width:
+            scale = self.work_width / w
+            gray = cv2.resize(gray, (self.work_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            area_scale = scale * scale
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._reset_background(gray)
+            return False
+
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(gray, self._background_u8, dst=self._delta)
+        cv2.threshold(self._delta, self._threshold_value(), 255, cv2.THRESH_BINARY, dst=self._thresh)
+        if self._mask is not None:
+            cv2.bitwise_and(self._thresh, self._mask, dst=self._thresh)
+        cv2.accumulateWeighted(gray, self._background, self.alpha)
+
+        min_area = max(1.0, self.min_area * area_scale)
+        self.last_changed_pixels = cv2.countNonZero(self._thresh)
+        # Not enough changed pixels for any blob to reach min_area
+        if self.last_changed_pixels < min_area:
+            return False
+
+        thresh = cv2.dilate(self._thresh, None, iterations=1)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for c in contours:
+            if cv2.contourArea(c) >= min_area:
+                logger.info("Motion detected.")
+                return True
+        return False
@@ -0,0 +1,334 @@
+import mimetypes
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from config_manager import get_config, subscribe
+from utils.logger import get_logger
+
+logger = get_logger("notify_dispatcher")
+
+# A file path, or (filename, data) for in-memory attachments such as a JPEG snapshot
+Attachment = Union[str, Tuple[str, bytes]]
+
+MAX_ATTACHMENTS = 5       # per message, digests keep the first ones
+IDLE_DISCONNECT = 120.0   # close the warm connection after this long without mail
+NOOP_AFTER = 30.0         # check an idle connection with NOOP before reusing it
+
+# Refused credentials or recipients won't fix themselves on retry
+_PERMANENT_ERRORS = (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused,
+                     smtplib.SMTPSenderRefused, smtplib.SMTPNotSupportedError)
+
+
+class NotificationDispatcher:
+    """
+    Queued email alerts over one warm SMTP connection.
+
+    submit() only enqueues and never blocks, so it is safe to call from the
+    detection path. A single worker thread sends the mail: every alert that
+    arrives within ``coalesce_window`` seconds of the first one goes out as
+    one digest message. Transient failures are retried with exponential
+    backoff while new alerts keep collecting into the next digest.
+
+    ``settings`` uses the keys of the "email" config section (smtp_server,
+    smtp_port, username, password, from_address, to_address). STARTTLS is
+    mandatory unless "allow_plaintext" is set, and credentials are never
+    sent without it. With allow_plaintext and no username a local relay or
+    stand-in such as ``python -m aiosmtpd -n -l 127.0.0.1:1025`` works.
+    """
+
+    def __init__(self, settings: Mapping, coalesce_window: float = 30.0, max_retries: int = 5,
+                 retry_base: float = 5.0, retry_max: float = 300.0, max_queue: int = 100,
+                 smtp_timeout: float = 15.0, smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP):
+        self._settings = dict(settings)
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.smtp_timeout = smtp_timeout
+        self.smtp_factory = smtp_factory
+
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._reconnect = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "dropped": 0, "messages_sent": 0, "alerts_sent": 0,
+                       "alerts_failed": 0, "retries": 0, "connections": 0, "last_error": None}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._settings.get("enabled") and self._settings.get("smtp_server")
+                    and self._settings.get("to_address"))
+
+    def update_settings(self, settings: Mapping):
+        """New SMTP settings; the worker reconnects before its next message."""
+        settings = dict(settings)
+        if settings != self._settings:
+            self._settings = settings
+            self._reconnect = True
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    # -- producer side -------------------------------------------------------
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True, name="notify-dispatcher")
+                self._thread.start()
+
+    def submit(self, subject: str, body: str, attachments: Optional[Sequence[Attachment]] = None) -> bool:
+        """Queue an alert without blocking. False if disabled or the queue is full."""
+        if not self.enabled:
+            return False
+        self.start()
+        alert = {"subject": subject, "body": body, "attachments": list(attachments or ()),
+                 "time": time.time()}
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"[NOTIFY] Queue full, dropping alert: {subject}")
+            return False
+        self._count("submitted")
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Send what is queued (without waiting out the window) and stop."""
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._disconnect()
+
+    # -- worker side ---------------------------------------------------------
+
+    def _drain(self) -> List[Dict]:
+        alerts = []
+        while True:
+            try:
+                alert = self._queue.get_nowait()
+            except queue.Empty:
+                return alerts
+            if alert is not None:
+                alerts.append(alert)
+
+    def _collect(self, first: Dict) -> List[Dict]:
+        """Wait out the coalescing window that ``first`` opened."""
+        batch = [first]
+        deadline = first["time"] + self.coalesce_window
+        while not self._stop.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                alert = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if alert is None:
+                break
+            batch.append(alert)
+        # Anything already queued rides along instead of opening a new window
+        return batch + self._drain()
+
+    def _run(self):
+        batch: List[Dict] = []
+        attempts = 0
+        while True:
+            if not batch:
+                if self._stop.is_set() and self._queue.empty():
+                    return
+                try:
+                    first = self._queue.get(timeout=IDLE_DISCONNECT / 4)
+                except queue.Empty:
+                    if self._smtp is not None and time.monotonic() - self._last_used > IDLE_DISCONNECT:
+                        self._disconnect(polite=True)
+                    if self._stop.is_set():
+                        return
+                    continue
+                if first is None:
+                    return
+                batch = self._collect(first)
+            else:
+                # Alerts that arrived during the backoff join the pending digest
+                batch.extend(self._drain())
+
+            attempts += 1
+            error = self._deliver(batch)
+            if error is None:
+                self._count("messages_sent")
+                self._count("alerts_sent", len(batch))
+                logger.info(f"[NOTIFY] Sent {len(batch)} alert(s) to {self._settings.get('to_address')}")
+                batch, attempts = [], 0
+                continue
+
+            if isinstance(error, _PERMANENT_ERRORS) or attempts > self.max_retries or self._stop.is_set():
+                self._count("alerts_failed", len(batch))
+                logger.error(f"[NOTIFY] Giving up on {len(batch)} alert(s) after {attempts} attempt(s): {error}")
+                batch, attempts = [], 0
+                if self._stop.is_set():
+                    return
+                continue
+
+            delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+            self._count("retries")
+            logger.warning(f"[NOTIFY] Send failed ({error}), retrying in {delay:.0f}s")
+            self._stop.wait(delay)
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._reconnect:
+            self._reconnect = False
+            self._disconnect(polite=True)
+        if self._smtp is not None and time.monotonic() - self._last_used > NOOP_AFTER:
+            try:
+                alive = self._smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                self._disconnect()
+        if self._smtp is None:
+            settings = self._settings
+            smtp = self.smtp_factory(settings["smtp_server"], int(settings.get("smtp_port", 587)),
+                                     timeout=self.smtp_timeout)
+            try:
+                smtp.ehlo()
+                encrypted = False
+                if smtp.has_extn("starttls") or not settings.get("allow_plaintext"):
+                    # Raises SMTPNotSupportedError if the server doesn't offer STARTTLS
+                    smtp.starttls(context=ssl.create_default_context())
+                    smtp.ehlo()
+                    encrypted = True
+                if settings.get("username"):
+                    if not encrypted:
+                        raise smtplib.SMTPNotSupportedError(
+                            "refusing to send SMTP credentials over an unencrypted connection")
+                    smtp.login(settings["username"], settings.get("password", ""))
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self._count("connections")
+            logger.info(f"[NOTIFY] Connected to {settings['smtp_server']}:{settings.get('smtp_port', 587)}")
+        return self._smtp
+
+    def _disconnect(self, polite: bool = False):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            if polite:
+                smtp.quit()
+            else:
+                smtp.close()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _deliver(self, batch: List[Dict]) -> Optional[Exception]:
+        """Send one message for ``batch``; returns the error, or None on success."""
+        message = self._build_message(batch)
+        while True:
+            warm = self._smtp is not None
+            try:
+                self._connection().send_message(message)
+                self._last_used = time.monotonic()
+                return None
+            except smtplib.SMTPServerDisconnected as e:
+                self._disconnect()
+                if warm:
+                    continue  # the server dropped the idle connection; reconnect right away
+                error = e
+            except (smtplib.SMTPException, OSError) as e:
+                self._disconnect()
+                error = e
+            with self._stats_lock:
+                self._stats["last_error"] = str(error)
+            return error
+
+    def _build_message(self, batch: List[Dict]) -> EmailMessage:
+        settings = self._settings
+        message = EmailMessage()
+        message["From"] = settings.get("from_address") or settings.get("username") or "me-cam@localhost"
+        message["To"] = settings["to_address"]
+
+        if len(batch) == 1:
+            message["Subject"] = batch[0]["subject"]
+            message.set_content(batch[0]["body"])
+        else:
+            message["Subject"] = f"{len(batch)} alerts: {batch[0]['subject']}"
+            parts = [f"{len(batch)} alerts between {_format_time(batch[0]['time'])} "
+                     f"and {_format_time(batch[-1]['time'])}:"]
+            for alert in batch:
+                parts.append(f"[{_format_time(alert['time'])}] {alert['subject']}\n{alert['body']}")
+            message.set_content("\n\n".join(parts))
+
+        attachments = [a for alert in batch for a in alert["attachments"]]
+        for attachment in attachments[:MAX_ATTACHMENTS]:
+            if isinstance(attachment, str):
+                name = os.path.basename(attachment)
+                try:
+                    with open(attachment, "rb") as f:
+                        data = f.read()
+                except OSError as e:
+                    logger.warning(f"[NOTIFY] Skipping attachment {attachment}: {e}")
+                    continue
+            else:
+                name, data = attachment
+            ctype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            maintype, subtype = ctype.split("/", 1)
+            message.add_attachment(data, maintype=maintype, subtype=subtype, filename=name)
+        return message
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["connected"] = self._smtp is not None
+        stats["coalesce_window_s"] = self.coalesce_window
+        return stats
+
+
+def _format_time(ts: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def _on_config_changed(config):
+    email_cfg = config.get("email", {})
+    _dispatcher.coalesce_window = float(email_cfg.get("coalesce_seconds", 30))
+    _dispatcher.update_settings(email_cfg)
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Process-wide dispatcher for the "email" config section; follows config changes."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                email_cfg = get_config().get("email", {})
+                _dispatcher = NotificationDispatcher(
+                    email_cfg,
+                    coalesce_window=float(email_cfg.get("coalesce_seconds", 30)),
+                    max_retries=int(email_cfg.get("max_retries", 5)),
+                )
+                subscribe(_on_config_changed)
+    return _dispatcher
@@ -1,8 +1,9 @@
-import yagmail
 from loguru import logger
 from config_manager import get_config
+from notifications.dispatcher import get_notification_dispatcher
 
 def send_email(subject, body, attachments=None):
+    """Queue an email; returns as soon as it is queued, sending happens in the background."""
     cfg = get_config()
     email_cfg = cfg["email"]
 
@@ -10,24 +11,9 @@ def send_email(subject, body, attachments=None):
         logger.info("[EMAIL] Email notifications disabled.")
         return False
 
-    try:
-        yag = yagmail.SMTP(
-            user=email_cfg["username"],
-            password=email_cfg["password"],
-            host=email_cfg["smtp_server"],
-            port=email_cfg["smtp_port"]
-        )
-
-        yag.send(
-            to=email_cfg["to_address"],
-            subject=subject,
-            contents=body,
-            attachments=attachments
-        )
-
-        logger.info(f"[EMAIL] Sent email to {email_cfg['to_address']}")
-        return True
-
-    except Exception as e:
-        logger.error(f"[EMAIL] Failed to send email: {e}")
+    if not get_notification_dispatcher().submit(subject, body, attachments):
+        logger.error("[EMAIL] Failed to queue email (not configured or queue full)")
         return False
+
+    logger.info(f"[EMAIL] Queued email to {email_cfg['to_address']}")
+    return True
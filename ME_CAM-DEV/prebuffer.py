@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("prebuffer")
+
+Frame = Tuple[float, bytes]  # (timestamp, jpeg)
+
+
+class ClipFeed:
+    """
+    Frames for one clip: the pre-event snapshot followed by live frames.
+
+    Frames are the same immutable ``bytes`` objects the streamer published,
+    so nothing is copied. If the consumer falls behind by more than
+    ``max_bytes`` the oldest pending frames are dropped.
+    """
+
+    def __init__(self, snapshot: List[Frame], max_bytes: int,
+                 on_close: Optional[Callable[["ClipFeed"], None]] = None):
+        self._cond = threading.Condition(threading.Lock())
+        self._pending: Deque[Frame] = deque(snapshot)
+        self._pending_bytes = sum(len(f) for _, f in snapshot)
+        self._max_bytes = max_bytes
+        self._on_close = on_close
+        self._closed = False
+        self.prebuffered = len(snapshot)
+        self.dropped = 0
+
+    def push(self, timestamp: float, frame: bytes):
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.append((timestamp, frame))
+            self._pending_bytes += len(frame)
+            first_drop = self.dropped == 0
+            while self._pending_bytes > self._max_bytes and len(self._pending) > 1:
+                _, old = self._pending.popleft()
+                self._pending_bytes -= len(old)
+                self.dropped += 1
+            self._cond.notify()
+        if first_drop and self.dropped:
+            logger.warning("[PREBUFFER] Recorder is falling behind, dropping clip frames")
+
+    def close(self):
+        """Stop accepting live frames; already pending frames are still delivered."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._on_close:
+            self._on_close(self)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __iter__(self) -> Iterator[Frame]:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                item = self._pending.popleft()
+                self._pending_bytes -= len(item[1])
+            yield item
+
+
+class PreEventBuffer:
+    """
+    Bounded in-memory ring of the most recent JPEG frames.
+
+    Frames are evicted once the ring holds more than ``max_seconds`` of video
+    or more than ``max_bytes`` of JPEG data, whichever comes first. The byte
+    budget is what keeps memory predictable on a 512 MB Pi Zero.
+    """
+
+    def __init__(self, max_seconds: float = 5.0, max_bytes: int = 24 * 1024 * 1024):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._frames: Deque[Frame] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._feeds: List[ClipFeed] = []
+
+    def append(self, frame: bytes, timestamp: Optional[float] = None):
+        """Add a frame; suitable as a FrameBroadcaster listener."""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._frames.append((timestamp, frame))
+            self._bytes += len(frame)
+            while self._frames and (
+                self._bytes > self.max_bytes or timestamp - self._frames[0][0] > self.max_seconds
+            ):
+                _, old = self._frames.popleft()
+                self._bytes -= len(old)
+            feeds = self._feeds
+        for feed in feeds:
+            feed.push(timestamp, frame)
+
+    def open_clip(self, after: Optional[float] = None, live_max_bytes: Optional[int] = None) -> ClipFeed:
+        """
+        Start a clip: returns a feed yielding the buffered frames and then
+        every live frame until the feed is closed. Buffered frames captured
+        at or before ``after`` (e.g. already written by the previous clip)
+        are left out.
+        """
+        with self._lock:
+            snapshot = [f for f in self._frames if after is None or f[0] > after]
+            feed = ClipFeed(snapshot, live_max_bytes or self.max_bytes, on_close=self._detach)
+            # Copy-on-write so append() can iterate without holding the lock
+            self._feeds = self._feeds + [feed]
+        logger.info(f"[PREBUFFER] Clip opened with {len(snapshot)} buffered frames")
+        return feed
+
+    def _detach(self, feed: ClipFeed):
+        with self._lock:
+            self._feeds = [f for f in self._feeds if f is not feed]
+
+    def stats(self) -> dict:
+        with self._lock:
+            span = self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+            return {
+                "frames": len(self._frames),
+                "bytes": self._bytes,
+                "seconds": round(span, 2),
+                "open_clips": len(self._feeds),
+            }
@@ -0,0 +1,315 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from prebuffer import ClipFeed
+from utils.logger import get_logger
+
+logger = get_logger("recorder")
+
+SEGMENT_EXT = ".mjpeg"
+INDEX_EXT = ".idx"
+
+# One index record per frame: capture timestamp, byte offset, frame length
+INDEX_RECORD = struct.Struct("<dQI")
+
+
+def segment_paths(recordings_dir: str, recording_id: str, number: int) -> Tuple[str, str]:
+    base = os.path.join(recordings_dir, f"{recording_id}_{number:04d}")
+    return base + SEGMENT_EXT, base + INDEX_EXT
+
+
+class SegmentWriter:
+    """
+    Append-only writer for one segment file and its frame index.
+
+    Frames are written before their index record, so every index entry
+    always points at a complete frame even after a power cut.
+    """
+
+    def __init__(self, path: str, index_path: str):
+        self.path = path
+        self.index_path = index_path
+        self._data = open(path, "ab", buffering=256 * 1024)
+        self._index = open(index_path, "ab", buffering=16 * 1024)
+        self._offset = self._data.tell()
+        self.frames = 0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+
+    def write(self, timestamp: float, frame: bytes):
+        self._data.write(frame)
+        self._index.write(INDEX_RECORD.pack(timestamp, self._offset, len(frame)))
+        self._offset += len(frame)
+        self.frames += 1
+        if self.first_ts is None:
+            self.first_ts = timestamp
+        self.last_ts = timestamp
+
+    @property
+    def size(self) -> int:
+        return self._offset
+
+    def close(self):
+        for f in (self._data, self._index):
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+
+
+class SegmentedRecorder:
+    """
+    Writes a clip as a series of fixed-duration MJPEG segment files.
+
+    Each ``<id>_NNNN.mjpeg`` segment gets a ``<id>_NNNN.idx`` index beside it.
+    ``on_segment_closed(path, info)`` is called once a segment is complete.
+    """
+
+    def __init__(self, recordings_dir: str, segment_seconds: float = 60.0,
+                 on_segment_closed: Optional[Callable[[str, dict], None]] = None):
+        self.recordings_dir = recordings_dir
+        self.segment_seconds = segment_seconds
+        self.on_segment_closed = on_segment_closed
+
+    def _new_recording_id(self) -> str:
+        base = "motion_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+        recording_id, n = base, 1
+        while os.path.exists(segment_paths(self.recordings_dir, recording_id, 0)[0]):
+            recording_id = f"{base}-{n}"
+            n += 1
+        return recording_id
+
+    def _close_segment(self, writer: SegmentWriter, recording_id: str):
+        writer.close()
+        info = {
+            "recording_id": recording_id,
+            "index_path": writer.index_path,
+            "frames": writer.frames,
+            "size": writer.size,
+            "start": writer.first_ts,
+            "end": writer.last_ts,
+            "duration": (writer.last_ts - writer.first_ts) if writer.frames else 0.0,
+        }
+        logger.info(f"[RECORDER] Closed segment {writer.path} ({writer.frames} frames)")
+        if self.on_segment_closed:
+            try:
+                self.on_segment_closed(writer.path, info)
+            except Exception as e:
+                logger.error(f"[RECORDER] Segment callback failed: {e}")
+
+    def record(self, frames: Iterable[Tuple[float, bytes]], recording_id: Optional[str] = None,
+               should_stop: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Consume ``(timestamp, jpeg)`` pairs until the iterable is exhausted.
+        ``should_stop`` is checked after each frame. Returns the recording id.
+        """
+        os.makedirs(self.recordings_dir, exist_ok=True)
+        if recording_id is None:
+            recording_id = self._new_recording_id()
+
+        number = 0
+        writer: Optional[SegmentWriter] = None
+        try:
+            for timestamp, frame in frames:
+                if writer is not None and timestamp - writer.first_ts >= self.segment_seconds:
+                    self._close_segment(writer, recording_id)
+                    writer = None
+                    number += 1
+                if writer is None:
+                    writer = SegmentWriter(*segment_paths(self.recordings_dir, recording_id, number))
+                writer.write(timestamp, frame)
+                if should_stop and should_stop():
+                    break
+        finally:
+            if writer is not None:
+                self._close_segment(writer, recording_id)
+        return recording_id
+
+
+class SegmentIndex:
+    """Read-only, memory-mapped view of a segment index file."""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # Ignore a trailing partial record from an interrupted write
+        self._count = size // INDEX_RECORD.size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._count else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, i: int) -> Tuple[float, int, int]:
+        return INDEX_RECORD.unpack_from(self._map, i * INDEX_RECORD.size)
+
+    def timestamp(self, i: int) -> float:
+        return self.record(i)[0]
+
+    def find(self, timestamp: float) -> int:
+        """Index of the last frame captured at or before ``timestamp`` (binary search)."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamp(mid) <= timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(0, lo - 1)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class RecordingReader:
+    """
+    Random access into a segmented recording.
+
+    Seeking costs one binary search over segment start times plus one over
+    the chosen segment's index; nothing is decoded from the start.
+    """
+
+    def __init__(self, recordings_dir: str, recording_id: str):
+        self.recordings_dir = recordings_dir
+        self.recording_id = recording_id
+        prefix = recording_id + "_"
+        self._segments: List[Tuple[float, str, SegmentIndex]] = []
+        for name in sorted(os.listdir(recordings_dir)):
+            if name.startswith(prefix) and name.endswith(SEGMENT_EXT):
+                path = os.path.join(recordings_dir, name)
+                index = SegmentIndex(path[:-len(SEGMENT_EXT)] + INDEX_EXT)
+                if len(index):
+                    self._segments.append((index.timestamp(0), path, index))
+                else:
+                    index.close()
+        if not self._segments:
+            raise FileNotFoundError(f"No segments for recording {recording_id}")
+
+    @property
+    def start_time(self) -> float:
+        return self._segments[0][0]
+
+    @property
+    def duration(self) -> float:
+        _, _, index = self._segments[-1]
+        return index.timestamp(len(index) - 1) - self.start_time
+
+    def seek(self, seconds: float) -> Tuple[str, int, int, float]:
+        """
+        Locate the frame shown ``seconds`` into the recording.
+        Returns ``(segment_path, byte_offset, length, timestamp)``.
+        """
+        target = self.start_time + max(0.0, seconds)
+        lo, hi = 0, len(self._segments)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._segments[mid][0] <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        _, path, index = self._segments[max(0, lo - 1)]
+        timestamp, offset, length = index.record(index.find(target))
+        return path, offset, length, timestamp
+
+    def read_frame_at(self, seconds: float) -> bytes:
+        path, offset, length, _ = self.seek(seconds)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def close(self):
+        for _, _, index in self._segments:
+            index.close()
+        self._segments = []
+
+
+class MotionClipRecorder:
+    """
+    Turns motion events into recordings.
+
+    The first event opens a clip (pre-event frames plus live frames) and
+    records it on a background thread; every further event extends the
+    post-roll. The clip ends ``post_event_seconds`` after the last event;
+    an event that arrives once the clip has decided to stop starts a new
+    clip as soon as the ending one is closed, without repeating frames the
+    ending one already wrote. The deadline is also watched on a timer, so a
+    stalled stream can't keep a clip open.
+    """
+
+    def __init__(self, open_clip: Callable[[Optional[float]], ClipFeed], recorder: SegmentedRecorder,
+                 post_event_seconds: float = 10.0):
+        self._open_clip = open_clip
+        self.recorder = recorder
+        self.post_event_seconds = post_event_seconds
+        self._lock = threading.Lock()
+        self._feed = None
+        self._until = 0.0
+        self._stopping = False  # the current clip is past its post-roll and ending
+        self._restart = False   # motion arrived while it was ending
+        self.dropped_frames = 0  # live frames lost because writing fell behind
+        self._last_written: Optional[float] = None  # timestamp of the last frame recorded
+
+    @property
+    def recording(self) -> bool:
+        return self._feed is not None
+
+    def on_motion(self, frame: bytes, timestamp: float):
+        """Motion listener: start a clip or extend the current one."""
+        with self._lock:
+            self._until = max(self._until, timestamp + self.post_event_seconds)
+            if self._feed is None:
+                self._start_clip()
+            elif self._stopping:
+                self._restart = True
+
+    def _start_clip(self):
+        # Called with self._lock held
+        self._stopping = self._restart = False
+        self._feed = self._open_clip(self._last_written)
+        threading.Thread(target=self._record, args=(self._feed,), daemon=True).start()
+        threading.Thread(target=self._watch_deadline, args=(self._feed,), daemon=True).start()
+
+    def _should_stop(self) -> bool:
+        with self._lock:
+            if time.time() >= self._until:
+                self._stopping = True
+            return self._stopping
+
+    def _watch_deadline(self, feed: ClipFeed):
+        # should_stop is only consulted when a frame arrives; without frames
+        # the feed is closed from here, which ends the recording
+        while not feed.closed:
+            remaining = self._until - time.time()
+            if remaining <= 0 and self._should_stop():
+                feed.close()
+                return
+            time.sleep(min(1.0, max(0.05, remaining)))
+
+    def _written(self, feed: ClipFeed):
+        for timestamp, frame in feed:
+            self._last_written = timestamp
+            yield timestamp, frame
+
+    def _record(self, feed):
+        try:
+            recording_id = self.recorder.record(self._written(feed), should_stop=self._should_stop)
+            logger.info(f"[RECORDER] Finished recording {recording_id}")
+        except Exception as e:
+            logger.error(f"[RECORDER] Recording failed: {e}")
+        finally:
+            feed.close()
+            if feed.dropped:
+                self.dropped_frames += feed.dropped
+                logger.warning(f"[RECORDER] Clip lost {feed.dropped} frames while writing fell behind")
+            with self._lock:
+                self._feed = None
+                if self._restart:
+                    self._start_clip()
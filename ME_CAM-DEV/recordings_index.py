@@ -0,0 +1,267 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("recordings_index")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, "config", "recordings.db")
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".mjpeg")
+ENCRYPTED_EXTENSION = ".enc"
+# Segments written by SegmentedRecorder: <recording id>_NNNN.mjpeg[.enc]
+_SEGMENT_NAME = re.compile(r"^(.+)_\d{4}\.mjpeg(?:\.enc)?$", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    duration REAL,
+    encrypted INTEGER NOT NULL DEFAULT 0,
+    thumb_path TEXT,
+    clip_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_mtime ON recordings (mtime);
+"""
+
+_COLUMNS = "id, name, path, size, mtime, duration, encrypted, thumb_path, clip_id"
+
+# One row per clip: its first segment, with size, duration and mtime (of
+# the newest segment) summed up over all of the clip's segments
+_CLIPS = """
+SELECT r.id, r.name, r.path, c.size, c.mtime, c.duration, r.encrypted, r.thumb_path,
+       r.clip_id, c.segments
+FROM recordings r JOIN (
+    SELECT MIN(id) AS first_id, SUM(size) AS size, MAX(mtime) AS mtime,
+           SUM(duration) AS duration, COUNT(*) AS segments
+    FROM recordings GROUP BY clip_id
+) c ON r.id = c.first_id
+"""
+
+
+def is_recording_file(name: str) -> bool:
+    name = name.lower()
+    return name.endswith(VIDEO_EXTENSIONS) or name.endswith(ENCRYPTED_EXTENSION)
+
+
+def clip_id_for(path: str) -> str:
+    """The recording id of a segment (shared by all its segments); other files are their own clip."""
+    match = _SEGMENT_NAME.match(os.path.basename(path))
+    return match.group(1) if match else os.path.abspath(path)
+
+
+class RecordingsIndex:
+    """
+    Persistent SQLite index of recordings.
+
+    Writers (recorder, encryptor, retention) keep it up to date as files are
+    created and deleted, so dashboard queries never touch the file system.
+    A full directory scan only happens in sync_dir(), once at startup.
+
+    Rows are files (segments); every segment of one motion clip carries the
+    clip's id. Retention works on segments, while list(), list_before(),
+    count() and count_since() report clips.
+    """
+
+    def __init__(self, db_path: str = INDEX_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Bumped on every change so API clients can revalidate cheaply
+        self.version = 0
+        self.last_modified = time.time()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        # Called with self._lock held, inside a transaction
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(recordings)")}
+        if "clip_id" not in columns:
+            self._conn.execute("ALTER TABLE recordings ADD COLUMN clip_id TEXT")
+        rows = self._conn.execute("SELECT id, path FROM recordings WHERE clip_id IS NULL").fetchall()
+        self._conn.executemany("UPDATE recordings SET clip_id = ? WHERE id = ?",
+                               [(clip_id_for(r["path"]), r["id"]) for r in rows])
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recordings_clip ON recordings (clip_id)")
+
+    def _changed(self):
+        self.version += 1
+        self.last_modified = time.time()
+
+    def add(self, path: str, size: Optional[int] = None, mtime: Optional[float] = None,
+            duration: Optional[float] = None, encrypted: Optional[bool] = None,
+            thumb_path: Optional[str] = None, clip_id: Optional[str] = None):
+        """
+        Insert or update the entry for ``path``; missing stats are read from
+        disk and a missing ``clip_id`` is derived from the segment name.
+        """
+        path = os.path.abspath(path)
+        if clip_id is None:
+            clip_id = clip_id_for(path)
+        if size is None or mtime is None:
+            st = os.stat(path)
+            size = st.st_size if size is None else size
+            mtime = st.st_mtime if mtime is None else mtime
+        if encrypted is None:
+            encrypted = path.lower().endswith(ENCRYPTED_EXTENSION)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO recordings (name, path, size, mtime, duration, encrypted, thumb_path, clip_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "duration = COALESCE(excluded.duration, duration), encrypted = excluded.encrypted, "
+                "thumb_path = COALESCE(excluded.thumb_path, thumb_path), clip_id = excluded.clip_id",
+                (os.path.basename(path), path, size, mtime, duration, int(encrypted), thumb_path, clip_id),
+            )
+            self._changed()
+
+    def remove(self, path: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM recordings WHERE path = ?", (os.path.abspath(path),))
+            self._changed()
+
+    def set_thumbnail(self, path: str, thumb_path: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE recordings SET thumb_path = ? WHERE path = ?", (thumb_path, os.path.abspath(path))
+            )
+            self._changed()
+
+    def get(self, recording_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM recordings WHERE id = ?", (recording_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_by_path(self, path: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM recordings WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def segments(self, clip_id: str) -> List[Dict]:
+        """Every segment of one clip, in recording order."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM recordings WHERE clip_id = ? ORDER BY name, id", (clip_id,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def list(self, limit: int = 12, offset: int = 0) -> List[Dict]:
+        """Clips, newest first. ``id`` is the clip's first segment, ``segments`` their count."""
+        with self._lock:
+            rows = self._conn.execute(
+                _CLIPS + " ORDER BY c.mtime DESC, r.id DESC LIMIT ? OFFSET ?", (limit, offset),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def list_before(self, limit: int = 50, cursor: Optional[Tuple[float, int]] = None) -> List[Dict]:
+        """Clips newest first, starting after the (mtime, id) ``cursor`` of the previous page."""
+        query = _CLIPS
+        params: tuple = ()
+        if cursor is not None:
+            query += " WHERE c.mtime < ? OR (c.mtime = ? AND r.id < ?)"
+            params = (cursor[0], cursor[0], cursor[1])
+        with self._lock:
+            rows = self._conn.execute(
+                query + " ORDER BY c.mtime DESC, r.id DESC LIMIT ?", params + (limit,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def newest_mtime(self) -> Optional[float]:
+        with self._lock:
+            return self._conn.execute("SELECT MAX(mtime) FROM recordings").fetchone()[0]
+
+    def oldest(self, limit: int = 50, before: Optional[float] = None) -> List[Dict]:
+        """Oldest first, optionally only entries older than ``before``."""
+        query = f"SELECT {_COLUMNS} FROM recordings"
+        params: tuple = ()
+        if before is not None:
+            query += " WHERE mtime < ?"
+            params = (before,)
+        with self._lock:
+            rows = self._conn.execute(
+                query + " ORDER BY mtime ASC, id ASC LIMIT ?", params + (limit,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self) -> int:
+        """Number of clips."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT clip_id) FROM recordings").fetchone()[0]
+
+    def count_since(self, timestamp: float) -> int:
+        """Number of clips with a segment written at or after ``timestamp``."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT clip_id) FROM recordings WHERE mtime >= ?", (timestamp,)
+            ).fetchone()[0]
+
+    def total_size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM recordings").fetchone()[0]
+
+    def sync_dir(self, directory: str):
+        """
+        Reconcile the index with one directory: add unknown files and drop
+        entries whose file no longer exists. Meant for startup, not requests.
+        """
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            return
+        seen = set()
+        added = 0
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or not is_recording_file(entry.name):
+                    continue
+                seen.add(entry.path)
+                st = entry.stat()
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT size, mtime FROM recordings WHERE path = ?", (entry.path,)
+                    ).fetchone()
+                if row is None or row["size"] != st.st_size or row["mtime"] != st.st_mtime:
+                    self.add(entry.path, size=st.st_size, mtime=st.st_mtime)
+                    added += 1
+
+        with self._lock, self._conn:
+            stale = [
+                r["path"] for r in self._conn.execute(
+                    "SELECT path FROM recordings WHERE path LIKE ?", (os.path.join(directory, "%"),)
+                )
+                if r["path"] not in seen and os.path.dirname(r["path"]) == directory
+            ]
+            self._conn.executemany("DELETE FROM recordings WHERE path = ?", [(p,) for p in stale])
+            if stale:
+                self._changed()
+        logger.info(f"[INDEX] Synced {directory}: {added} added/updated, {len(stale)} removed")
+
+
+_index: Optional[RecordingsIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_recordings_index() -> RecordingsIndex:
+    """Process-wide shared index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RecordingsIndex()
+    return _index
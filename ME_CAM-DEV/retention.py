@@ -0,0 +1,199 @@
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config_manager import get_config
+from recorder import INDEX_EXT, SEGMENT_EXT
+from recordings_index import RecordingsIndex, get_recordings_index
+from storage_accounting import StorageAccountant, get_storage_accountant
+from thumbnail_cache import ThumbnailCache, get_thumbnail_cache
+from utils.logger import get_logger
+from utils.threads import lower_thread_priority
+
+logger = get_logger("retention")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENCRYPTED_EXT = ".enc"
+
+
+class RetentionManager:
+    """
+    Deletes old recordings by age and by free-space watermarks.
+
+    Candidates come oldest-first from the recordings index, so a pass never
+    walks the recordings tree. When free space drops below the high
+    watermark, recordings are evicted until it is back above the low one.
+    Deletion runs in small batches on a low-priority thread with a pause
+    between batches, leaving the SD card to the recorder.
+    """
+
+    def __init__(self, recordings_dir: str, index: RecordingsIndex, accountant: StorageAccountant,
+                 thumbnails: Optional[ThumbnailCache] = None, batch_size: int = 20,
+                 batch_pause: float = 0.5):
+        self.recordings_dir = recordings_dir
+        self.index = index
+        self.accountant = accountant
+        self.thumbnails = thumbnails
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_run: Optional[float] = None
+        self.deleted_files = 0
+        self.freed_bytes = 0
+
+    def _settings(self) -> Dict[str, float]:
+        # Read on every pass so changes from the setup page apply without a restart
+        storage = get_config().get("storage", {})
+        high = float(storage.get("retention_high_watermark_pct", 10))
+        low = max(high, float(storage.get("retention_low_watermark_pct", 20)))
+        return {"days": float(storage.get("retention_days", 7)), "high": high, "low": low}
+
+    def _free_pct(self) -> float:
+        usage = shutil.disk_usage(self.recordings_dir if os.path.isdir(self.recordings_dir) else BASE_DIR)
+        return usage.free * 100.0 / usage.total if usage.total else 100.0
+
+    def _remove_file(self, path: Optional[str]) -> int:
+        if not path:
+            return 0
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def _index_path_for(self, path: str) -> Optional[str]:
+        """
+        The .idx frame index of a segment. Encrypted segments live in another
+        directory, but their (older, plaintext) index stays in recordings_dir.
+        """
+        if path.endswith(ENCRYPTED_EXT):
+            name = os.path.basename(path[:-len(ENCRYPTED_EXT)])
+            if not name.endswith(SEGMENT_EXT):
+                return None
+            return os.path.join(self.recordings_dir, name[:-len(SEGMENT_EXT)] + INDEX_EXT)
+        if path.endswith(SEGMENT_EXT):
+            return path[:-len(SEGMENT_EXT)] + INDEX_EXT
+        return None
+
+    def _delete(self, rec: Dict) -> int:
+        """Delete one recording with its frame index and thumbnails; returns bytes freed."""
+        path = rec["path"]
+        freed = size = self._remove_file(path)
+        if size:
+            self.accountant.record_delete(path, size)
+
+        index_path = self._index_path_for(path)
+        if index_path:
+            size = self._remove_file(index_path)
+            if size:
+                self.accountant.record_delete(index_path, size)
+                freed += size
+
+        thumbs = {rec["thumb_path"]}
+        if self.thumbnails is not None:
+            thumbs.add(self.thumbnails.thumb_path_for(path, rec["size"], rec["mtime"]))
+        for thumb in thumbs:
+            freed += self._remove_file(thumb)
+
+        self.index.remove(path)
+        return freed
+
+    def _delete_batch(self, batch: List[Dict]) -> int:
+        freed = 0
+        for rec in batch:
+            try:
+                freed += self._delete(rec)
+            except OSError as e:
+                logger.warning(f"[RETENTION] Failed to delete {rec['path']}: {e}")
+                # Drop the entry anyway, or it would be retried forever
+                self.index.remove(rec["path"])
+        self.deleted_files += len(batch)
+        self.freed_bytes += freed
+        return freed
+
+    def run_once(self) -> Dict[str, int]:
+        """One retention pass; returns how many files were deleted by each rule."""
+        with self._lock:
+            settings = self._settings()
+            by_age = by_space = 0
+
+            if settings["days"] > 0:
+                cutoff = time.time() - settings["days"] * 86400
+                while not self._stop.is_set():
+                    batch = self.index.oldest(self.batch_size, before=cutoff)
+                    if not batch:
+                        break
+                    self._delete_batch(batch)
+                    by_age += len(batch)
+                    self._stop.wait(self.batch_pause)
+
+            if self._free_pct() < settings["high"]:
+                logger.warning(f"[RETENTION] Free space below {settings['high']}%, evicting oldest recordings")
+                while not self._stop.is_set() and self._free_pct() < settings["low"]:
+                    batch = self.index.oldest(self.batch_size)
+                    if not batch:
+                        logger.warning("[RETENTION] Nothing left to evict, disk is still low on space")
+                        break
+                    self._delete_batch(batch)
+                    by_space += len(batch)
+                    self._stop.wait(self.batch_pause)
+
+            self.last_run = time.time()
+            if by_age or by_space:
+                logger.info(f"[RETENTION] Deleted {by_age} expired and {by_space} recordings for space")
+            return {"by_age": by_age, "by_space": by_space}
+
+    def _loop(self, interval: float):
+        # Nice 19 also lowers I/O priority under the CFQ/BFQ schedulers
+        lower_thread_priority()
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"[RETENTION] Pass failed: {e}")
+            self._stop.wait(interval)
+
+    def start(self, interval: float = 600.0):
+        """Run a pass now and then every ``interval`` seconds in the background."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {
+            "last_run": self.last_run,
+            "deleted_files": self.deleted_files,
+            "freed_bytes": self.freed_bytes,
+            "free_pct": round(self._free_pct(), 1),
+        }
+
+
+_manager: Optional[RetentionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_retention_manager() -> RetentionManager:
+    """Process-wide manager for the configured recordings directory."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                storage = get_config().get("storage", {})
+                _manager = RetentionManager(
+                    os.path.join(BASE_DIR, storage.get("recordings_dir", "recordings")),
+                    get_recordings_index(),
+                    get_storage_accountant(),
+                    get_thumbnail_cache(),
+                    batch_size=int(storage.get("retention_batch_size", 20)),
+                )
+    return _manager
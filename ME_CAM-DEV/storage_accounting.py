@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from config_manager import get_config
+from utils.logger import get_logger
+from utils.threads import lower_thread_priority
+
+logger = get_logger("storage_accounting")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StorageAccountant:
+    """
+    Running byte and file totals per storage directory.
+
+    Writers report files they create or delete, so reading usage is O(1).
+    A periodic low-priority reconcile scan corrects any drift (files touched
+    by other tools, crashes between write and report, ...).
+    """
+
+    def __init__(self, directories: Iterable[str] = ()):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, list] = {}
+        self._scan_changes: Dict[str, Set[str]] = {}  # paths reported while a directory is rescanned
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_reconcile: Optional[float] = None
+        self.last_drift = 0
+        for directory in directories:
+            self.track(directory)
+
+    def track(self, directory: str):
+        with self._lock:
+            self._totals.setdefault(os.path.abspath(directory), [0, 0])
+
+    def _root_for(self, path: str) -> Optional[str]:
+        path = os.path.abspath(path)
+        best = None
+        for root in self._totals:
+            if path.startswith(root + os.sep) and (best is None or len(root) > len(best)):
+                best = root
+        return best
+
+    def _apply(self, path: str, size_delta: int, file_delta: int):
+        with self._lock:
+            root = self._root_for(path)
+            if root is None:
+                return
+            totals = self._totals[root]
+            totals[0] = max(0, totals[0] + size_delta)
+            totals[1] = max(0, totals[1] + file_delta)
+            changed = self._scan_changes.get(root)
+            if changed is not None:
+                changed.add(os.path.abspath(path))
+
+    def record_write(self, path: str, size: int):
+        """A new file of ``size`` bytes was written."""
+        self._apply(path, size, 1)
+
+    def record_delete(self, path: str, size: int):
+        """A file of ``size`` bytes was removed."""
+        self._apply(path, -size, -1)
+
+    def usage(self, directory: str) -> Tuple[int, int]:
+        """(bytes, files) for a tracked directory."""
+        totals = self._totals.get(os.path.abspath(directory), (0, 0))
+        return totals[0], totals[1]
+
+    def total_bytes(self) -> int:
+        return sum(t[0] for t in list(self._totals.values()))
+
+    def total_files(self) -> int:
+        return sum(t[1] for t in list(self._totals.values()))
+
+    def _scan(self, directory: str) -> Dict[str, int]:
+        """Size of every file under ``directory``, by path."""
+        sizes: Dict[str, int] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    sizes[path] = os.path.getsize(path)
+                except OSError:
+                    pass
+                if len(sizes) % 200 == 0:
+                    # Yield the SD card to the recorder
+                    time.sleep(0.01)
+        return sizes
+
+    def reconcile(self):
+        """
+        Rescan every tracked directory and replace the running totals.
+
+        The walk may or may not have seen a file that was written or deleted
+        while it ran, so every path reported during a directory's scan is
+        re-checked afterwards instead of trusting the walk's view of it.
+        """
+        drift = 0
+        for directory in list(self._totals):
+            directory = os.path.abspath(directory)
+            with self._lock:
+                self._scan_changes[directory] = set()
+            try:
+                sizes = self._scan(directory) if os.path.isdir(directory) else {}
+            except Exception:
+                with self._lock:
+                    self._scan_changes.pop(directory, None)
+                raise
+            with self._lock:
+                for path in self._scan_changes.pop(directory):
+                    try:
+                        sizes[path] = os.path.getsize(path)
+                    except OSError:
+                        sizes.pop(path, None)
+                totals = [sum(sizes.values()), len(sizes)]
+                drift += abs(self._totals[directory][0] - totals[0])
+                self._totals[directory] = totals
+        initial = self.last_reconcile is None
+        self.last_reconcile = time.time()
+        self.last_drift = drift
+        if drift and not initial:
+            logger.info(f"[STORAGE] Reconcile corrected {drift} bytes of drift")
+
+    def _reconcile_loop(self, interval: float):
+        lower_thread_priority()
+        while not self._stop.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.warning(f"[STORAGE] Reconcile failed: {e}")
+            self._stop.wait(interval)
+
+    def start_reconciler(self, interval: float = 3600.0):
+        """Reconcile now and then every ``interval`` seconds in the background."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reconcile_loop, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {d: {"bytes": t[0], "files": t[1]} for d, t in self._totals.items()}
+
+
+_accountant: Optional[StorageAccountant] = None
+_accountant_lock = threading.Lock()
+
+
+def get_storage_accountant() -> StorageAccountant:
+    """Process-wide accountant tracking the recordings and encrypted directories."""
+    global _accountant
+    if _accountant is None:
+        with _accountant_lock:
+            if _accountant is None:
+                storage = get_config().get("storage", {})
+                _accountant = StorageAccountant([
+                    os.path.join(BASE_DIR, storage.get("recordings_dir", "recordings")),
+                    os.path.join(BASE_DIR, storage.get("encrypted_dir", "recordings_encrypted")),
+                ])
+    return _accountant
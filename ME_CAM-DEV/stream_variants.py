@@ -0,0 +1,189 @@
+import threading
+import time
+from typing import Dict, Generator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_broadcaster import FrameBroadcaster
+from utils.logger import get_logger
+
+logger = get_logger("stream_variants")
+
+MAX_VARIANTS = 4
+MIN_WIDTH = 160
+DEFAULT_QUALITY = 80
+
+
+class StreamVariant:
+    """
+    A downscaled / rate-limited / re-encoded copy of the source stream.
+
+    A single worker thread transcodes each source frame at most once and
+    publishes the result to every subscriber. The worker only runs while
+    the variant has at least one subscriber.
+    """
+
+    def __init__(self, source: FrameBroadcaster, width: int, fps: int, quality: int,
+                 source_width: int):
+        self.source = source
+        self.width = width
+        self.fps = fps
+        self.quality = quality
+        self.source_width = source_width
+        self.broadcaster = FrameBroadcaster()
+
+        self._lock = threading.Lock()
+        self._subscribers = 0
+        self._generation = 0
+        self.frames_encoded = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def _decode_flag(self) -> int:
+        # Let libjpeg do most of the downscaling while decoding.
+        factor = self.source_width / max(self.width, 1)
+        if factor >= 8:
+            return cv2.IMREAD_REDUCED_COLOR_8
+        if factor >= 4:
+            return cv2.IMREAD_REDUCED_COLOR_4
+        if factor >= 2:
+            return cv2.IMREAD_REDUCED_COLOR_2
+        return cv2.IMREAD_COLOR
+
+    def _transcode(self, jpeg: bytes) -> Optional[bytes]:
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), self._decode_flag())
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        if w != self.width:
+            height = max(2, int(round(h * self.width / w)) & ~1)
+            img = cv2.resize(img, (self.width, height), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buf.tobytes() if ok else None
+
+    def _run(self, generation: int):
+        interval = 1.0 / self.fps
+        last_seq = 0
+        next_due = 0.0
+        while self._generation == generation:
+            seq, frame = self.source.wait_for_frame(last_seq, timeout=1.0)
+            if frame is None:
+                continue
+            last_seq = seq
+
+            now = time.monotonic()
+            # Small slack so source frame jitter doesn't halve the output rate
+            if now < next_due - 0.01:
+                continue
+            next_due = max(next_due + interval, now)
+
+            try:
+                out = self._transcode(frame)
+            except Exception as e:
+                logger.warning(f"[VARIANT] Transcode failed for {self.width}px: {e}")
+                continue
+            if out:
+                self.frames_encoded += 1
+                self.broadcaster.publish(out)
+
+    def _acquire(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._subscribers == 1:
+                self._generation += 1
+                threading.Thread(target=self._run, args=(self._generation,), daemon=True).start()
+                logger.info(f"[VARIANT] Started {self.width}px @ {self.fps} fps q{self.quality}")
+
+    def _release(self):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers == 0:
+                # Bumping the generation stops the worker on its next wakeup
+                self._generation += 1
+                logger.info(f"[VARIANT] Stopped {self.width}px @ {self.fps} fps q{self.quality}")
+
+    def frames(self) -> Generator[bytes, None, None]:
+        self._acquire()
+        try:
+            yield from self.broadcaster.frames()
+        finally:
+            self._release()
+
+
+class StreamVariantManager:
+    """
+    Hands out shared StreamVariant instances keyed by normalized parameters.
+
+    Requested values are clamped and rounded so that near-identical requests
+    share one variant, and at most MAX_VARIANTS are kept.
+    """
+
+    def __init__(self, source: FrameBroadcaster, source_width: int, source_fps: int):
+        self.source = source
+        self.source_width = source_width
+        self.source_fps = source_fps
+        self._variants: Dict[Tuple[int, int, int], StreamVariant] = {}
+        self._lock = threading.Lock()
+
+    def update_source(self, source_width: int, source_fps: int):
+        """Called when the camera resolution / fps changes."""
+        with self._lock:
+            self.source_width = source_width
+            self.source_fps = source_fps
+            for key, variant in list(self._variants.items()):
+                if variant.subscribers == 0 or key[0] > source_width:
+                    del self._variants[key]
+                else:
+                    variant.source_width = source_width
+
+    def _normalize(self, width: Optional[int], fps: Optional[int],
+                   quality: Optional[int]) -> Tuple[int, int, int]:
+        if width is None:
+            width = self.source_width
+        width = max(MIN_WIDTH, min(int(width), self.source_width))
+        if width < self.source_width:
+            width -= width % 32
+
+        if fps is None:
+            fps = self.source_fps
+        fps = max(1, min(int(fps), self.source_fps))
+
+        if quality is None:
+            quality = DEFAULT_QUALITY
+        quality = max(20, min(int(quality), 95))
+        quality -= quality % 5
+        return width, fps, quality
+
+    def get(self, width: Optional[int] = None, fps: Optional[int] = None,
+            quality: Optional[int] = None) -> Optional[StreamVariant]:
+        """
+        Return the shared variant for the requested parameters, or None
+        when the request is equivalent to the untouched source stream.
+        """
+        if width is None and fps is None and quality is None:
+            return None
+
+        with self._lock:
+            key = self._normalize(width, fps, quality)
+            if key[0] == self.source_width and key[1] == self.source_fps and quality is None:
+                return None
+
+            variant = self._variants.get(key)
+            if variant is not None:
+                return variant
+
+            if len(self._variants) >= MAX_VARIANTS:
+                idle = [k for k, v in self._variants.items() if v.subscribers == 0]
+                if idle:
+                    del self._variants[idle[0]]
+                else:
+                    # Too many concurrent variants: share the closest one.
+                    closest = min(self._variants, key=lambda k: (abs(k[0] - key[0]), abs(k[1] - key[1])))
+                    return self._variants[closest]
+
+            variant = StreamVariant(self.source, *key, source_width=self.source_width)
+            self._variants[key] = variant
+            return variant
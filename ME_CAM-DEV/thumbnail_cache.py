@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set
+
+from recordings_index import get_recordings_index
+from thumbnail_gen import extract_thumbnail
+from utils.logger import get_logger
+
+logger = get_logger("thumbnail_cache")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+THUMB_DIR = os.path.join(BASE_DIR, "web", "static", "thumbs")
+MAX_FAILED = 1024  # remembered failed extractions, oldest forgotten first
+
+
+class ThumbnailCache:
+    """
+    Thumbnails keyed by (path, size, mtime).
+
+    A lookup is a single stat of the cached file. Missing thumbnails are
+    generated by a small background pool; callers get None (and should
+    show a placeholder) until the thumbnail is ready. A file whose
+    extraction failed is not retried until its size or mtime changes.
+    """
+
+    def __init__(self, thumb_dir: str = THUMB_DIR, workers: int = 2,
+                 on_ready: Optional[Callable[[str, str], None]] = None):
+        self.thumb_dir = thumb_dir
+        self.on_ready = on_ready
+        os.makedirs(thumb_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._pending: Set[str] = set()
+        self._failed: Dict[str, None] = {}  # insertion-ordered set of cache keys
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(path: str, size: int, mtime: float) -> str:
+        raw = f"{os.path.abspath(path)}|{size}|{mtime}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()[:24]
+
+    def thumb_path_for(self, path: str, size: int, mtime: float) -> str:
+        return os.path.join(self.thumb_dir, self.cache_key(path, size, mtime) + ".jpg")
+
+    def get(self, path: str, size: int, mtime: float) -> Optional[str]:
+        """Return the cached thumbnail path, or None after queueing generation."""
+        thumb_path = self.thumb_path_for(path, size, mtime)
+        if os.path.exists(thumb_path):
+            return thumb_path
+        self.request(path, size, mtime)
+        return None
+
+    def request(self, path: str, size: int, mtime: float):
+        """Queue background generation unless it is already queued or failed before."""
+        key = self.cache_key(path, size, mtime)
+        with self._lock:
+            if key in self._pending or key in self._failed:
+                return
+            self._pending.add(key)
+        self._pool.submit(self._generate, path, size, mtime, key)
+
+    def generate(self, path: str, size: int, mtime: float) -> Optional[str]:
+        """Generate synchronously (e.g. before the source is encrypted and deleted)."""
+        thumb_path = self.thumb_path_for(path, size, mtime)
+        if os.path.exists(thumb_path):
+            # Still report it: the index row may be newer than the thumbnail (e.g. after a restart)
+            if self.on_ready:
+                self.on_ready(path, thumb_path)
+            return thumb_path
+        try:
+            thumb_path = extract_thumbnail(path, self.thumb_dir, thumb_name=os.path.basename(thumb_path))
+        except Exception:
+            self._mark_failed(path, size, mtime)
+            raise
+        if not thumb_path:
+            self._mark_failed(path, size, mtime)
+        elif self.on_ready:
+            self.on_ready(path, thumb_path)
+        return thumb_path
+
+    def _mark_failed(self, path: str, size: int, mtime: float):
+        with self._lock:
+            self._failed[self.cache_key(path, size, mtime)] = None
+            while len(self._failed) > MAX_FAILED:
+                del self._failed[next(iter(self._failed))]
+
+    def _generate(self, path: str, size: int, mtime: float, key: str):
+        try:
+            self.generate(path, size, mtime)
+        except Exception as e:
+            logger.warning(f"[THUMBNAIL] Background generation failed for {path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Process-wide shared cache; ready thumbnails are recorded in the recordings index."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache(
+                    on_ready=lambda path, thumb: get_recordings_index().set_thumbnail(path, thumb)
+                )
+    return _cache
@@ -1,7 +1,21 @@
 import cv2
 import os
+import numpy as np
 from loguru import logger
 
+from mjpeg_splitter import MJPEGFrameSplitter
+
+THUMB_SIZE = (200, 112)
+
+
+def _first_mjpeg_frame(video_path: str):
+    """Decode the first JPEG of a raw MJPEG segment at reduced scale."""
+    splitter = MJPEGFrameSplitter(capacity=1024 * 1024, chunk_size=256 * 1024)
+    with open(video_path, "rb") as f:
+        for jpeg in splitter.iter_stream(f, copy=False):
+            return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_4)
+    return None
+
 def extract_thumbnail(video_path: str, thumb_dir: str, thumb_name: str = None) -> str:
     """Extract first frame from video and save as thumbnail.
     
@@ -20,13 +34,17 @@ def extract_thumbnail(video_path: str, thumb_dir: str, thumb_name: str = None) -
             thumb_name = os.path.basename(video_path) + ".jpg"
         thumb_path = os.path.join(thumb_dir, thumb_name)
         
-        cap = cv2.VideoCapture(video_path)
-        ret, frame = cap.read()
-        cap.release()
+        if video_path.lower().endswith(".mjpeg"):
+            frame = _first_mjpeg_frame(video_path)
+            ret = frame is not None
+        else:
+            cap = cv2.VideoCapture(video_path)
+            ret, frame = cap.read()
+            cap.release()
         
         if ret and frame is not None:
             # Resize to thumbnail size (e.g., 200x112 for 16:9)
-            frame = cv2.resize(frame, (200, 112))
+            frame = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
             cv2.imwrite(thumb_path, frame)
             logger.info(f"[THUMBNAIL] Extracted: {thumb_path}")
             return thumb_path
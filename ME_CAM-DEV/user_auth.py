@@ -1,14 +1,54 @@
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.security import generate_password_hash, check_password_hash
 from loguru import logger
+from utils.threads import lower_thread_priority
 
 USERS_FILE = "config/users.json"
 
+# Password hashing is deliberately slow (hundreds of ms on a Pi Zero). It runs
+# on a small low-priority pool so a burst of logins can't starve the stream
+# threads; beyond MAX_PENDING_HASHES waiting requests, logins are refused.
+HASH_WORKERS = 1
+MAX_PENDING_HASHES = 8
+HASH_TIMEOUT = 10.0
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="auth-hash",
+                                initializer=lower_thread_priority)
+_hash_slots = threading.BoundedSemaphore(MAX_PENDING_HASHES)
+
+_lock = threading.RLock()
+_users_cache = {}
+_users_stamp = None
+
+def _run_hash(func, *args):
+    """Run a hash function on the pool; returns None if the pool is saturated."""
+    if not _hash_slots.acquire(timeout=HASH_TIMEOUT):
+        logger.warning("[AUTH] Too many pending password checks, rejecting request")
+        return None
+    try:
+        return _hash_pool.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _stamp():
+    st = os.stat(USERS_FILE)
+    return st.st_mtime_ns, st.st_size
+
+def _write_users(users):
+    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
+    tmp_path = USERS_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(users, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, USERS_FILE)
+
 def _ensure_users_file():
     """Create users file if it doesn't exist."""
     if not os.path.exists(USERS_FILE):
-        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
         default_users = {
             "admin": {
                 "password_hash": generate_password_hash("admin123"),
@@ -16,26 +56,36 @@ def _ensure_users_file():
                 "role": "admin"
             }
         }
-        with open(USERS_FILE, 'w') as f:
-            json.dump(default_users, f, indent=2)
+        _write_users(default_users)
         logger.info("[AUTH] Created default admin user (username: admin, password: admin123)")
 
+def _cached_users():
+    """Shared cached users dict, reloaded only when the file changes. Do not mutate."""
+    global _users_cache, _users_stamp
+    with _lock:
+        try:
+            _ensure_users_file()
+            stamp = _stamp()
+            if stamp != _users_stamp:
+                with open(USERS_FILE, 'r') as f:
+                    _users_cache = json.load(f)
+                _users_stamp = stamp
+        except Exception as e:
+            logger.error(f"[AUTH] Error loading users: {e}")
+        return _users_cache
+
 def get_users():
-    """Load all users from file."""
-    _ensure_users_file()
-    try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"[AUTH] Error loading users: {e}")
-        return {}
+    """Load all users (a copy that callers may modify)."""
+    return {name: dict(user) for name, user in _cached_users().items()}
 
 def save_users(users):
     """Save users to file."""
+    global _users_cache, _users_stamp
     try:
-        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f, indent=2)
+        with _lock:
+            _write_users(users)
+            _users_cache = {name: dict(user) for name, user in users.items()}
+            _users_stamp = _stamp()
         logger.info("[AUTH] Users saved")
         return True
     except Exception as e:
@@ -44,43 +94,52 @@ def save_users(users):
 
 def user_exists(username):
     """Check if username exists."""
-    users = get_users()
-    return username in users
+    return username in _cached_users()
 
 def authenticate(username, password):
     """Authenticate user with username and password."""
-    users = get_users()
-    if username not in users:
+    user = _cached_users().get(username)
+    if user is None:
         return False
-    
-    user = users[username]
-    return check_password_hash(user.get("password_hash", ""), password)
+    return bool(_run_hash(check_password_hash, user.get("password_hash", ""), password))
 
 def create_user(username, password, pin="1234"):
     """Create new user."""
     if user_exists(username):
         logger.warning(f"[AUTH] User {username} already exists")
         return False
-    
-    users = get_users()
-    users[username] = {
-        "password_hash": generate_password_hash(password),
-        "pin": pin,
-        "role": "user"
-    }
-    return save_users(users)
+
+    password_hash = _run_hash(generate_password_hash, password)
+    if password_hash is None:
+        return False
+
+    with _lock:
+        users = get_users()
+        if username in users:
+            logger.warning(f"[AUTH] User {username} already exists")
+            return False
+        users[username] = {
+            "password_hash": password_hash,
+            "pin": pin,
+            "role": "user"
+        }
+        return save_users(users)
 
 def change_password(username, old_password, new_password):
     """Change user password."""
     if not authenticate(username, old_password):
         logger.warning(f"[AUTH] Wrong password for user {username}")
         return False
-    
-    users = get_users()
-    users[username]["password_hash"] = generate_password_hash(new_password)
-    return save_users(users)
+
+    password_hash = _run_hash(generate_password_hash, new_password)
+    if password_hash is None:
+        return False
+    with _lock:
+        users = get_users()
+        users[username]["password_hash"] = password_hash
+        return save_users(users)
 
 def get_user(username):
     """Get user details."""
-    users = get_users()
-    return users.get(username)
+    user = _cached_users().get(username)
+    return dict(user) if user is not None else None
@@ -0,0 +1,10 @@
+import os
+import threading
+
+
+def lower_thread_priority():
+    """Drop the calling thread to the lowest CPU priority (per-thread on Linux)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
@@ -1,6 +1,7 @@
 import threading
 import time
 from threading import Event
+from typing import Optional
 from utils.logger import get_logger
 from camera_pipeline import CameraPipeline
 
@@ -8,13 +9,16 @@ logger = get_logger("watchdog")
 
 
 class CameraWatchdog:
-    def __init__(self):
+    def __init__(self, pipeline: Optional[CameraPipeline] = None):
         self.stop_event = Event()
         self.thread = None
+        # Share the web app's pipeline so detection and streaming use one camera
+        self.pipeline = pipeline
 
     def _run_pipeline(self):
-        pipeline = CameraPipeline(self.stop_event)
-        pipeline.run()
+        if self.pipeline is None:
+            self.pipeline = CameraPipeline(self.stop_event)
+        self.pipeline.run()
 
     def start(self):
         logger.info("Starting camera pipeline.")
@@ -24,6 +28,8 @@ class CameraWatchdog:
     def stop(self):
         logger.info("Stopping camera pipeline.")
         self.stop_event.set()
+        if self.pipeline:
+            self.pipeline.stop()
         if self.thread:
             self.thread.join()
 
@@ -31,7 +37,8 @@ class CameraWatchdog:
         """Return pipeline status"""
         return {
             "active": self.thread and self.thread.is_alive(),
-            "timestamp": time.time()
+            "timestamp": time.time(),
+            "detection": self.pipeline.stats() if self.pipeline else {}
         }
 
     def supervise(self):
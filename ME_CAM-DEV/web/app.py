@@ -1,37 +1,68 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, send_file, abort
+import threading
 from threading import Event
 from loguru import logger
+import hashlib
+import hmac
+import io
+import json
 import os
-from datetime import datetime
+import mimetypes
+import shutil
+from datetime import datetime, timezone
 import time
 import sys
 
 # Add parent directory to path so we can import modules from the root
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config_manager import get_config, save_config, is_first_run, mark_first_run_complete
+from config_manager import get_config, get_mutable_config, save_config, is_first_run
 from watchdog import CameraWatchdog
 from camera_pipeline import CameraPipeline
 from battery_monitor import BatteryMonitor
-from thumbnail_gen import extract_thumbnail
+from thumbnail_cache import get_thumbnail_cache
 from user_auth import authenticate, create_user, user_exists, get_user
 from qr_generator import generate_setup_qr
+from recordings_index import get_recordings_index
+from storage_accounting import get_storage_accountant
+from encryption_queue import get_encryption_service
+from retention import get_retention_manager
+from encryptor import ChunkedDecryptor, is_chunked, decrypt_bytes
+from mjpeg_splitter import MJPEGFrameSplitter
+from recorder import INDEX_EXT, SEGMENT_EXT, SegmentIndex
+from werkzeug.datastructures import Range
 
 # Flask app
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.urandom(24)
 
 # Core services
-watchdog = CameraWatchdog()
+# NEW CAMERA PIPELINE (libcamera-vid MJPEG), shared by streaming and detection
+pipeline = CameraPipeline()
+
+watchdog = CameraWatchdog(pipeline)
 watchdog.start()
 
 battery = BatteryMonitor(enabled=True)
 
-# NEW CAMERA PIPELINE (libcamera-vid MJPEG)
-pipeline = CameraPipeline()
+recordings_index = get_recordings_index()
+thumbnail_cache = get_thumbnail_cache()
+
+storage_accountant = get_storage_accountant()
+storage_accountant.start_reconciler(
+    interval=float(get_config().get("storage", {}).get("reconcile_interval_minutes", 60)) * 60
+)
+
+retention_manager = get_retention_manager()
+retention_manager.start(
+    interval=float(get_config().get("storage", {}).get("retention_interval_minutes", 10)) * 60
+)
 
 # Base directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+THUMB_PLACEHOLDER = os.path.join(BASE_DIR, "web", "static", "thumb_placeholder.svg")
+# Index versions restart with the process, so ETags carry a per-process salt
+_ETAG_SALT = os.urandom(4).hex()
 
 
 # ------------------------------
@@ -43,69 +74,56 @@ def _recordings_path(cfg):
     return os.path.join(BASE_DIR, rec_dir)
 
 
-def get_recordings(cfg, limit=12):
-    path = _recordings_path(cfg)
-    thumb_dir = os.path.join(BASE_DIR, "web", "static", "thumbs")
+def _encrypted_path(cfg):
+    enc_dir = cfg.get("storage", {}).get("encrypted_dir", "recordings_encrypted")
+    return os.path.join(BASE_DIR, enc_dir)
+
+
+def _sync_recordings_index():
+    """Pick up files the index doesn't know about yet (runs once at startup)."""
+    cfg = get_config()
+    for path in (_recordings_path(cfg), _encrypted_path(cfg)):
+        try:
+            recordings_index.sync_dir(path)
+        except Exception as e:
+            logger.warning(f"[RECORDINGS] Failed to sync index for {path}: {e}")
+
+
+threading.Thread(target=_sync_recordings_index, daemon=True).start()
+
+
+def get_recordings(cfg, limit=12, page=1):
     videos = []
     try:
-        os.makedirs(thumb_dir, exist_ok=True)
-        if os.path.isdir(path):
-            for name in os.listdir(path):
-                if name.lower().endswith((".mp4", ".mov", ".avi", ".mkv")):
-                    full = os.path.join(path, name)
-                    ts = os.path.getmtime(full)
-                    thumb_path = extract_thumbnail(full, thumb_dir)
-                    thumb_url = f"/static/thumbs/{os.path.basename(thumb_path)}" if thumb_path else None
-                    videos.append({
-                        "name": name,
-                        "date": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M"),
-                        "thumb_url": thumb_url
-                    })
-        videos.sort(key=lambda v: v["date"], reverse=True)
+        for rec in recordings_index.list(limit=limit, offset=(max(page, 1) - 1) * limit):
+            # Thumbnails are served lazily by /thumb/<id>; never decode during a render
+            # Encrypted recordings keep the thumbnail taken before encryption, if any
+            has_thumb = not rec["encrypted"] or rec["thumb_path"]
+            thumb_url = url_for("thumbnail", rec_id=rec["id"]) if has_thumb else None
+            if not rec["encrypted"] and not rec["thumb_path"]:
+                thumbnail_cache.request(rec["path"], rec["size"], rec["mtime"])
+            videos.append({
+                "id": rec["id"],
+                "name": rec["name"],
+                "date": datetime.fromtimestamp(rec["mtime"]).strftime("%Y-%m-%d %H:%M"),
+                "thumb_url": thumb_url,
+                "play_url": url_for("play_recording", rec_id=rec["id"])
+            })
     except Exception as e:
         logger.warning(f"[RECORDINGS] Failed to list recordings: {e}")
-    return videos[:limit]
+    return videos
 
 
 def get_storage_used_gb(cfg):
-    paths = [
-        _recordings_path(cfg),
-        os.path.join(BASE_DIR, cfg.get("storage", {}).get("encrypted_dir", "recordings_encrypted"))
-    ]
-    total_bytes = 0
-    try:
-        for path in paths:
-            if not os.path.isdir(path):
-                continue
-            for root, _, files in os.walk(path):
-                for f in files:
-                    try:
-                        total_bytes += os.path.getsize(os.path.join(root, f))
-                    except Exception:
-                        pass
-    except Exception as e:
-        logger.warning(f"[STORAGE] Failed to compute size: {e}")
-    return round(total_bytes / (1024 ** 3), 2)
+    # Running totals kept by storage_accounting; no file system access here
+    return round(storage_accountant.total_bytes() / (1024 ** 3), 2)
 
 
 def count_recent_events(cfg, hours=24):
     cutoff_ts = (datetime.now()).timestamp() - (hours * 3600)
     count = 0
     try:
-        path = _recordings_path(cfg)
-        if os.path.isdir(path):
-            for name in os.listdir(path):
-                if name.lower().endswith((".mp4", ".mov", ".avi", ".mkv")):
-                    full = os.path.join(path, name)
-                    if os.path.getmtime(full) >= cutoff_ts:
-                        count += 1
-        enc = os.path.join(BASE_DIR, cfg.get("storage", {}).get("encrypted_dir", "recordings_encrypted"))
-        if os.path.isdir(enc):
-            for name in os.listdir(enc):
-                if name.lower().endswith(".enc"):
-                    full = os.path.join(enc, name)
-                    if os.path.getmtime(full) >= cutoff_ts:
-                        count += 1
+        count = recordings_index.count_since(cutoff_ts)
     except Exception as e:
         logger.warning(f"[HISTORY] Failed to count recent events: {e}")
     return count
@@ -137,7 +155,7 @@ def setup():
 
 @app.route("/setup/save", methods=["POST"])
 def setup_save():
-    cfg = get_config()
+    cfg = get_mutable_config()
     cfg["device_name"] = request.form.get("device_name", cfg["device_name"])
     cfg["pin_enabled"] = request.form.get("pin_enabled") == "on"
     cfg["pin_code"] = request.form.get("pin_code") or cfg["pin_code"]
@@ -147,8 +165,8 @@ def setup_save():
     cfg["detection"]["person_only"] = request.form.get("person_only") == "on"
     cfg["detection"]["sensitivity"] = float(request.form.get("sensitivity") or 0.6)
     cfg["emergency_phone"] = request.form.get("emergency_phone", "")
+    cfg["first_run_completed"] = True
     save_config(cfg)
-    mark_first_run_complete()
     logger.info("[SETUP] First run completed.")
     return redirect(url_for("index"))
 
@@ -199,6 +217,17 @@ def require_auth():
     return session.get("authenticated", False)
 
 
+def api_key_valid(key):
+    """Check an X-API-Key value against the configured api_key (disabled when empty)."""
+    expected = get_config().get("api_key", "")
+    return bool(expected and key) and hmac.compare_digest(str(key), str(expected))
+
+
+def require_api_auth():
+    # A browser session, or an API key for the hub and other scripts
+    return require_auth() or api_key_valid(request.headers.get("X-API-Key"))
+
+
 @app.route("/logout")
 def logout():
     session.clear()
@@ -220,7 +249,10 @@ def index():
         cfg = get_config()
         status = watchdog.status()
         battery_status = battery.get_status()
-        videos = get_recordings(cfg, limit=12)
+        page = max(1, request.args.get("page", 1, type=int))
+        per_page = 12
+        video_count = recordings_index.count()
+        videos = get_recordings(cfg, limit=per_page, page=page)
         storage_used = get_storage_used_gb(cfg)
         history_count = count_recent_events(cfg, hours=24)
 
@@ -233,8 +265,10 @@ def index():
             battery_external=battery_status.get("external_power"),
             battery_low=battery_status.get("is_low"),
             storage_used=storage_used,
-            video_count=len(videos),
+            video_count=video_count,
             videos=videos,
+            page=page,
+            page_count=max(1, (video_count + per_page - 1) // per_page),
             history_count=history_count,
             emergency_phone=cfg.get("emergency_phone", "Not configured")
         )
@@ -243,26 +277,175 @@ def index():
         return render_template("fallback.html", message="Camera unavailable")
 
 
+@app.route("/thumb/<int:rec_id>")
+def thumbnail(rec_id):
+    if not require_auth():
+        abort(401)
+    rec = recordings_index.get(rec_id)
+    if rec is None:
+        abort(404)
+    if rec["encrypted"]:
+        thumb_path = rec["thumb_path"] if rec["thumb_path"] and os.path.exists(rec["thumb_path"]) else None
+    else:
+        thumb_path = thumbnail_cache.get(rec["path"], rec["size"], rec["mtime"])
+    if thumb_path:
+        return send_file(thumb_path, mimetype="image/jpeg", max_age=86400)
+    # Not generated yet: placeholder that the browser must not cache
+    response = send_file(THUMB_PLACEHOLDER, mimetype="image/svg+xml", max_age=0)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _recording_mimetype(name):
+    if name.lower().endswith(".enc"):
+        name = name[:-4]
+    if name.lower().endswith(".mjpeg"):
+        return "video/x-motion-jpeg"
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _decrypted_range(path, start, stop):
+    with ChunkedDecryptor(path) as dec:
+        yield from dec.read_range(start, stop)
+
+
+def _segment_frames(path, encrypted):
+    """(timestamp, jpeg) for each frame of one segment; timestamp is None without a frame index."""
+    index_path = path[:-len(SEGMENT_EXT)] + INDEX_EXT
+    if not encrypted and os.path.exists(index_path):
+        index = SegmentIndex(index_path)
+        try:
+            with open(path, "rb") as f:
+                for i in range(len(index)):
+                    timestamp, offset, length = index.record(i)
+                    f.seek(offset)
+                    yield timestamp, f.read(length)
+        finally:
+            index.close()
+        return
+
+    # Encrypted segments have no frame index left: split the plaintext stream
+    splitter = MJPEGFrameSplitter()
+    if not encrypted:
+        with open(path, "rb") as f:
+            for frame in splitter.iter_stream(f):
+                yield None, frame
+    elif is_chunked(path):
+        with ChunkedDecryptor(path) as dec:
+            for chunk in dec:
+                for frame in splitter.feed(chunk):
+                    yield None, frame
+    else:
+        for frame in splitter.feed(decrypt_bytes(path)):
+            yield None, frame
+
+
+def recording_generator(rec):
+    """Replay a motion clip from ``rec``'s segment on, at its recorded pace."""
+    segments = recordings_index.segments(rec["clip_id"])
+    ids = [seg["id"] for seg in segments]
+    segments = segments[ids.index(rec["id"]):] if rec["id"] in ids else [rec]
+    frame_interval = 1.0 / max(1, int(get_config().get("stream_fps", 15)))
+    next_at = time.monotonic()
+    last_ts = None
+    for seg in segments:
+        if not os.path.exists(seg["path"]):
+            continue
+        for timestamp, frame in _segment_frames(seg["path"], seg["encrypted"]):
+            if timestamp is None or last_ts is None:
+                delay = frame_interval
+            else:
+                delay = min(max(0.0, timestamp - last_ts), 1.0)
+            last_ts = timestamp
+            next_at += delay
+            pause = next_at - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            else:
+                next_at = time.monotonic()
+            yield _mjpeg_part(frame)
+
+
+@app.route("/recordings/<int:rec_id>/play")
+def play_recording(rec_id):
+    if not require_auth():
+        abort(401)
+    rec = recordings_index.get(rec_id)
+    if rec is None or not os.path.exists(rec["path"]):
+        abort(404)
+    mimetype = _recording_mimetype(rec["name"])
+    if mimetype == "video/x-motion-jpeg":
+        # Browsers can't play raw MJPEG files; replay the clip as a multipart
+        # stream, which they show in an <img>
+        if request.args.get("stream"):
+            return Response(recording_generator(rec), mimetype="multipart/x-mixed-replace; boundary=frame")
+        return render_template("recording_player.html", rec=rec,
+                               stream_url=url_for("play_recording", rec_id=rec_id, stream=1))
+    if not rec["encrypted"]:
+        # Several ranges: send the whole file (200), as RFC 7233 allows
+        multiple = request.range is not None and len(request.range.ranges) > 1
+        return send_file(rec["path"], mimetype=mimetype, conditional=not multiple)
+
+    if not is_chunked(rec["path"]):
+        # Legacy Fernet files can only be decrypted as a whole
+        data = decrypt_bytes(rec["path"])
+        return send_file(io.BytesIO(data), mimetype=mimetype, conditional=True,
+                         download_name=rec["name"][:-4], max_age=0)
+
+    # Decrypt on the fly, only the chunks covering the requested range
+    with ChunkedDecryptor(rec["path"]) as dec:
+        length = dec.plaintext_size
+    byte_range = None
+    if request.range:
+        # Only the first of several ranges is served
+        byte_range = Range(request.range.units, request.range.ranges[:1]).range_for_length(length)
+    if request.range and byte_range is None:
+        response = Response(status=416)
+        response.headers["Content-Range"] = f"bytes */{length}"
+        return response
+    start, stop = byte_range or (0, length)
+
+    response = Response(_decrypted_range(rec["path"], start, stop), mimetype=mimetype,
+                        status=206 if byte_range else 200, direct_passthrough=True)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Content-Length"] = str(stop - start)
+    response.headers["Cache-Control"] = "private, no-store"
+    if byte_range:
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+    return response
+
+
 # ------------------------------
 # MJPEG STREAMING (NEW)
 # ------------------------------
 
-def mjpeg_generator():
-    for frame in pipeline.mjpeg_frames():
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" +
-            frame +
-            b"\r\n"
-        )
+def _mjpeg_part(frame):
+    return (
+        b"--frame\r\n"
+        b"Content-Type: image/jpeg\r\n\r\n" +
+        frame +
+        b"\r\n"
+    )
+
+
+def mjpeg_generator(width=None, fps=None, quality=None):
+    for frame in pipeline.mjpeg_frames(width=width, fps=fps, quality=quality):
+        if not frame:
+            continue  # idle tick, no new frame
+        yield _mjpeg_part(frame)
 
 
 @app.route("/stream.mjpg")
 def stream_mjpg():
-    if not require_auth():
+    if not require_api_auth():
         return redirect(url_for("login"))
+    # Optional ?w=640&fps=5&q=60 selects a shared downscaled variant
     return Response(
-        mjpeg_generator(),
+        mjpeg_generator(
+            width=request.args.get("w", type=int),
+            fps=request.args.get("fps", type=int),
+            quality=request.args.get("q", type=int),
+        ),
         mimetype="multipart/x-mixed-replace; boundary=frame"
     )
 
@@ -279,6 +462,7 @@ def settings():
     cfg = get_config()
 
     if request.method == "POST":
+        cfg = get_mutable_config()
         try:
             # Existing settings
             cfg["wifi_enabled"] = request.form.get("wifi_enabled") == "on"
@@ -308,8 +492,8 @@ def settings():
             cfg["stream_resolution"] = request.form.get("stream_resolution", "1536x864")
             cfg["stream_fps"] = int(request.form.get("stream_fps", 15))
 
+            # The pipeline is subscribed and restarts the stream if resolution/fps changed
             save_config(cfg)
-            pipeline.update_stream_settings()
 
             logger.info("[SETTINGS] Configuration updated successfully.")
             return redirect(url_for("settings"))
@@ -327,7 +511,109 @@ def settings():
 
 @app.route("/api/status")
 def api_status():
-    return jsonify(watchdog.status())
+    status = watchdog.status()
+    status["encryption"] = get_encryption_service().stats()
+    status["retention"] = retention_manager.stats()
+    return jsonify(status)
+
+
+def _not_modified(etag):
+    """304 for a client that already holds ``etag``, without building the payload."""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return None
+
+
+def _json_response(payload, etag=None, last_modified=None):
+    if etag is None:
+        etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+    response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+@app.route("/api/recordings")
+def api_recordings():
+    """Newest first; pass the returned next_cursor as ?cursor= for the next page."""
+    if not require_api_auth():
+        abort(401)
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    cursor_arg = request.args.get("cursor", "")
+    cursor = None
+    if cursor_arg:
+        try:
+            mtime, rec_id = cursor_arg.split(":")
+            cursor = (float(mtime), int(rec_id))
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+
+    etag = f"rec-{_ETAG_SALT}-{recordings_index.version}-{limit}-{cursor_arg}"
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+
+    rows = recordings_index.list_before(limit=limit, cursor=cursor)
+    items = [{
+        "id": rec["id"],
+        "name": rec["name"],
+        "size": rec["size"],
+        "mtime": rec["mtime"],
+        "duration": rec["duration"],
+        "segments": rec["segments"],
+        "encrypted": bool(rec["encrypted"]),
+        "thumb_url": url_for("thumbnail", rec_id=rec["id"]) if not rec["encrypted"] or rec["thumb_path"] else None,
+        "play_url": url_for("play_recording", rec_id=rec["id"]),
+    } for rec in rows]
+    next_cursor = f"{rows[-1]['mtime']!r}:{rows[-1]['id']}" if len(rows) == limit else None
+    return _json_response({"recordings": items, "next_cursor": next_cursor}, etag=etag,
+                          last_modified=recordings_index.last_modified)
+
+
+@app.route("/api/events")
+def api_events():
+    if not require_api_auth():
+        abort(401)
+    hours = max(1, min(request.args.get("hours", 24, type=int), 24 * 30))
+    # The count also changes as events age out of the window, so revalidate every minute
+    etag = f"ev-{_ETAG_SALT}-{recordings_index.version}-{hours}-{int(time.time() // 60)}"
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+    payload = {
+        "hours": hours,
+        "count": count_recent_events(get_config(), hours=hours),
+        "last_event": recordings_index.newest_mtime(),
+    }
+    return _json_response(payload, etag=etag, last_modified=recordings_index.last_modified)
+
+
+@app.route("/api/storage")
+def api_storage():
+    if not require_api_auth():
+        abort(401)
+    disk = shutil.disk_usage(BASE_DIR)
+    payload = {
+        "used_bytes": storage_accountant.total_bytes(),
+        "files": storage_accountant.total_files(),
+        "directories": {os.path.relpath(d, BASE_DIR): usage
+                        for d, usage in storage_accountant.snapshot().items()},
+        "disk_total_mb": disk.total // (1024 * 1024),
+        "disk_free_mb": disk.free // (1024 * 1024),
+    }
+    return _json_response(payload)
+
+
+@app.route("/api/battery")
+def api_battery():
+    if not require_api_auth():
+        abort(401)
+    return _json_response(battery.get_status())
 
 
 @app.route("/api/trigger_emergency", methods=["POST"])
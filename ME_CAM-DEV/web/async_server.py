@@ -0,0 +1,320 @@
+"""
+asyncio HTTP server for the web app.
+
+``/stream.mjpg`` is served natively: one feed thread per distinct stream
+pulls frames from the pipeline and hands them to the event loop, which
+writes the same multipart chunk to every viewer with non-blocking
+transport writes. Viewers whose socket buffer is still full simply skip
+frames, so a slow client never stalls the others and no thread is held
+per viewer.
+
+Every other request goes to the Flask WSGI app on a small thread pool,
+with HTTP/1.1 keep-alive for responses that carry a Content-Length.
+"""
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote
+
+from loguru import logger
+
+StreamKey = Tuple[Optional[int], Optional[int], Optional[int]]
+FrameSource = Callable[[Optional[int], Optional[int], Optional[int]], Iterator[bytes]]
+
+MAX_BUFFERED_BYTES = 512 * 1024
+REQUEST_TIMEOUT = 15.0
+MAX_HEADERS = 100
+MAX_BODY_BYTES = 16 * 1024 * 1024  # unless the app sets MAX_CONTENT_LENGTH
+
+_STREAM_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+    b"Cache-Control: no-cache, private\r\n"
+    b"Connection: close\r\n\r\n"
+)
+
+
+def _int_arg(query: Dict[str, list], name: str) -> Optional[int]:
+    try:
+        return int(query[name][0])
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+class MJPEGFanout:
+    """Delivers each stream's frames to all of its viewers from the event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, frame_source: FrameSource,
+                 max_buffered: int = MAX_BUFFERED_BYTES):
+        self._loop = loop
+        self._frame_source = frame_source
+        self.max_buffered = max_buffered
+        # Only touched on the event loop thread
+        self._viewers: Dict[StreamKey, Set[asyncio.StreamWriter]] = {}
+        self._feeds: Set[StreamKey] = set()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def add_viewer(self, key: StreamKey, writer: asyncio.StreamWriter):
+        self._viewers.setdefault(key, set()).add(writer)
+        if key not in self._feeds:
+            self._start_feed(key)
+
+    def remove_viewer(self, key: StreamKey, writer: asyncio.StreamWriter):
+        viewers = self._viewers.get(key)
+        if viewers is not None:
+            viewers.discard(writer)
+            if not viewers:
+                del self._viewers[key]
+
+    def _start_feed(self, key: StreamKey):
+        self._feeds.add(key)
+        threading.Thread(target=self._feed, args=(key,), daemon=True, name=f"mjpeg-feed-{key}").start()
+
+    def _feed(self, key: StreamKey):
+        frames = self._frame_source(*key)
+        try:
+            for frame in frames:
+                if not self._viewers.get(key):
+                    break
+                if not frame:
+                    continue
+                part = (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+                        % len(frame)) + frame + b"\r\n"
+                self._loop.call_soon_threadsafe(self._deliver, key, part)
+        except Exception as e:
+            logger.error(f"[STREAM] Feed {key} failed: {e}")
+        finally:
+            frames.close()
+            self._loop.call_soon_threadsafe(self._feed_stopped, key)
+
+    def _feed_stopped(self, key: StreamKey):
+        self._feeds.discard(key)
+        if self._viewers.get(key):
+            # A viewer joined while the feed was shutting down
+            self._start_feed(key)
+
+    def _deliver(self, key: StreamKey, part: bytes):
+        for writer in list(self._viewers.get(key, ())):
+            transport = writer.transport
+            if transport.is_closing():
+                self.remove_viewer(key, writer)
+            elif transport.get_write_buffer_size() > self.max_buffered:
+                self.frames_dropped += 1
+            else:
+                transport.write(part)
+                self.frames_sent += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "viewers": sum(len(v) for v in self._viewers.values()),
+            "streams": len(self._feeds),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+class AsyncAppServer:
+    """Serves ``/stream.mjpg`` from the event loop and everything else through WSGI."""
+
+    def __init__(self, app, frame_source: FrameSource, host: str = "0.0.0.0", port: int = 8080,
+                 wsgi_workers: int = 8, api_key_valid: Optional[Callable[[str], bool]] = None):
+        self.app = app
+        self.frame_source = frame_source
+        self.api_key_valid = api_key_valid
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=wsgi_workers, thread_name_prefix="wsgi")
+        self.fanout: Optional[MJPEGFanout] = None
+
+    # -- request handling ------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, version = request_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError("too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers.append((name.strip(), value.strip()))
+        return method, target, version, headers
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # HTTP/1.1 keep-alive: serve requests until the client or a response ends it
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+                if request is None:
+                    return
+                method, target, version, headers = request
+                path, _, query = target.partition("?")
+                if method == "GET" and path == "/stream.mjpg":
+                    await self._serve_stream(reader, writer, headers, query)
+                    return
+                if not await self._serve_wsgi(reader, writer, method, path, query, version, headers):
+                    return
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.warning(f"[SERVER] Request failed: {e}")
+        finally:
+            writer.close()
+
+    def _authorized(self, headers) -> bool:
+        if self.api_key_valid is not None:
+            key = next((v for n, v in headers if n.lower() == "x-api-key"), None)
+            if key and self.api_key_valid(key):
+                return True
+        return self._session_authenticated(headers)
+
+    def _session_authenticated(self, headers) -> bool:
+        """Check the signed Flask session cookie without a request context."""
+        cookie_name = self.app.config.get("SESSION_COOKIE_NAME", "session")
+        for name, value in headers:
+            if name.lower() != "cookie":
+                continue
+            morsel = SimpleCookie(value).get(cookie_name)
+            if morsel is None:
+                continue
+            serializer = self.app.session_interface.get_signing_serializer(self.app)
+            try:
+                data = serializer.loads(
+                    morsel.value, max_age=int(self.app.permanent_session_lifetime.total_seconds())
+                )
+            except Exception:
+                return False
+            return bool(data.get("authenticated"))
+        return False
+
+    async def _serve_stream(self, reader, writer, headers, query: str):
+        if not self._authorized(headers):
+            writer.write(b"HTTP/1.1 302 Found\r\nLocation: /login\r\nContent-Length: 0\r\n"
+                         b"Connection: close\r\n\r\n")
+            await writer.drain()
+            return
+
+        # Optional ?w=640&fps=5&q=60 selects a shared downscaled variant
+        args = parse_qs(query)
+        key = (_int_arg(args, "w"), _int_arg(args, "fps"), _int_arg(args, "q"))
+        writer.write(_STREAM_HEADERS)
+        self.fanout.add_viewer(key, writer)
+        try:
+            # Nothing more is expected from the client; EOF means it went away
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.fanout.remove_viewer(key, writer)
+
+    def _environ(self, writer, method, path, query, version, headers, body: bytes) -> dict:
+        server_name, server_port = writer.get_extra_info("sockname")[:2]
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(path, encoding="latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": str(server_name),
+            "SERVER_PORT": str(server_port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0],
+            "REMOTE_PORT": str(peer[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers:
+            key = name.upper().replace("-", "_")
+            if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[key] = value
+                continue
+            key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    @staticmethod
+    async def _simple_response(writer, status: str):
+        body = status.encode("latin-1")
+        writer.write(b"HTTP/1.1 %s\r\nContent-Type: text/plain\r\nContent-Length: %d\r\n"
+                     b"Connection: close\r\n\r\n%s" % (body, len(body), body))
+        await writer.drain()
+
+    async def _serve_wsgi(self, reader, writer, method, path, query, version, headers) -> bool:
+        """Run one request through the WSGI app; returns whether the connection stays open."""
+        header_map = {n.lower(): v for n, v in headers}
+        keep_alive = version == "HTTP/1.1" and header_map.get("connection", "").lower() != "close"
+        if "transfer-encoding" in header_map:
+            # Chunked bodies aren't decoded; left unread they would be parsed as the next request
+            await self._simple_response(writer, "411 Length Required")
+            return False
+        try:
+            length = int(header_map.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._simple_response(writer, "400 Bad Request")
+            return False
+        if length > (self.app.config.get("MAX_CONTENT_LENGTH") or MAX_BODY_BYTES):
+            await self._simple_response(writer, "413 Payload Too Large")
+            return False
+        body = await reader.readexactly(length) if length else b""
+        environ = self._environ(writer, method, path, query, version, headers, body)
+
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = response_headers
+            return lambda data: None
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._executor, self.app, environ, start_response)
+        try:
+            chunks = iter(result)
+            # Large bodies (recordings) are produced chunk by chunk in the pool
+            chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+            head = [f"HTTP/1.1 {response['status']}"]
+            head += [f"{n}: {v}" for n, v in response["headers"] if n.lower() != "connection"]
+            # Without a length the body can only be delimited by closing the connection
+            has_length = any(n.lower() == "content-length" for n, _ in response["headers"])
+            keep_alive = keep_alive and (has_length or response["status"][:3] in ("204", "304"))
+            if not keep_alive:
+                head.append("Connection: close")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            while chunk is not None:
+                if chunk:
+                    writer.write(chunk)
+                    await writer.drain()
+                chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+            await writer.drain()
+            return keep_alive
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self._executor, result.close)
+
+    # -- lifecycle -------------------------------------------------------
+
+    async def serve_forever(self):
+        self.fanout = MJPEGFanout(asyncio.get_running_loop(), self.frame_source)
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"[SERVER] Async server listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        asyncio.run(self.serve_forever())
@@ -1,19 +1,69 @@
 from cryptography.fernet import Fernet
-import os
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+import base64, os, struct
 
 KEY_FILE = "key.key"
 
+# Same chunked AES-GCM format as ME_CAM-DEV/encryptor.py (version 2): a
+# header, then 64 KB chunks each sealed with nonce prefix || index and a
+# "final" flag; the final chunk also authenticates the plaintext size.
+MAGIC = b"MECAMENC"
+VERSION = 2
+CHUNK_SIZE = 64 * 1024
+HEADER = struct.Struct("<8sB3xI8sQ")
+
 if not os.path.exists(KEY_FILE):
     with open(KEY_FILE, "wb") as f:
         f.write(Fernet.generate_key())
 
 key = open(KEY_FILE, "rb").read()
 cipher = Fernet(key)
+aesgcm = AESGCM(HKDF(
+    algorithm=hashes.SHA256(), length=32, salt=None, info=b"me_cam chunked recording v1"
+).derive(base64.urlsafe_b64decode(key)))
+
+
+def _read_full(src, buf):
+    view = memoryview(buf)
+    total = 0
+    while total < len(buf):
+        n = src.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
 
 def encrypt_file(path):
-    with open(path, "rb") as f:
-        data = f.read()
-    encrypted = cipher.encrypt(data)
     out = path.replace("motion_videos", "encrypted_videos") + ".enc"
-    with open(out, "wb") as f:
-        f.write(encrypted)
+    prefix = os.urandom(8)
+    fixed_header = HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, 0)[:-8]
+    current, lookahead = bytearray(CHUNK_SIZE), bytearray(CHUNK_SIZE)
+    total = index = 0
+
+    # Written under a temporary name so a crash never leaves a truncated .enc
+    tmp = out + ".part"
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, 0))
+        n = _read_full(src, current)
+        while True:
+            next_n = _read_full(src, lookahead) if n == CHUNK_SIZE else 0
+            final = next_n == 0
+            nonce = prefix + struct.pack(">I", index)
+            aad = fixed_header + bytes([final])
+            if final:
+                aad += struct.pack("<Q", total + n)
+            dst.write(aesgcm.encrypt(nonce, memoryview(current)[:n], aad))
+            total += n
+            index += 1
+            if final:
+                break
+            current, lookahead, n = lookahead, current, next_n
+        dst.seek(0)
+        dst.write(HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, prefix, total))
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, out)
+    return out
@@ -1,9 +1,24 @@
-import cv2, time
+import cv2, time, queue, threading
 from encryptor import encrypt_file
 
 cam = cv2.VideoCapture(0)
 last_motion = time.time()
 
+# Encrypt off the capture loop; put() only blocks once 8 files are waiting
+encrypt_queue = queue.Queue(maxsize=8)
+
+def encrypt_worker():
+    while True:
+        path = encrypt_queue.get()
+        try:
+            encrypt_file(path)
+        except Exception as e:
+            print(f"Encryption failed for {path}: {e}")
+        finally:
+            encrypt_queue.task_done()
+
+threading.Thread(target=encrypt_worker, daemon=True).start()
+
 while True:
     ret, frame = cam.read()
     if not ret:
@@ -15,5 +30,5 @@ while True:
     if time.time() - last_motion > 10:
         filename = f"motion_videos/{int(time.time())}.jpg"
         cv2.imwrite(filename, frame)
-        encrypt_file(filename)
+        encrypt_queue.put(filename)
         last_motion = time.time()